@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+import config as cfg
+
+
+def settings() -> dict:
+    """ Configuration values (see config), to be applied in other
+    processes (see apply_settings), so they search the same way
+    """
+    return {name: value for name, value in vars(cfg).items()
+            if name.isupper() and isinstance(value, (bool, int, float, str, type(None)))}
+
+
+def apply_settings(values: dict) -> None:
+    for name, value in values.items():
+        setattr(cfg, name, value)
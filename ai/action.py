@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from abc import ABC
-from entities.wall import Wall
+from engine.wall import Wall
 from entities.coord import Coord
 
 
@@ -1,183 +1,547 @@
 # -*- coding: utf-8 -*-
 
-import re
-from typing import List, Union, Tuple
+import itertools
+import os
+import threading
+import time
+from typing import Iterator, List, Optional, Union, Tuple
 
 from helpers import log, LogLevel
 import core
 import config as cfg
 from config import INF
-from cache import PersistentDict
+from engine.bitboard import wall_index
+from engine.game import Game
 
-from entities.wall import Wall
-from entities.coord import Coord
+from . import batch
+from .distributed import Coordinator
+from .smp import LazySMP
 from .action import Action, ActionPlaceWall, ActionMovePawn
+from .tt import TranspositionTable, EXACT, LOWER, UPPER
+
+WIN = INF  # Value of reaching the goal
+WIN_BOUND = WIN - cfg.AI_MAX_DEPTH - 1  # Values beyond it (or below -WIN_BOUND) are wins (losses) in some plies
+
+# Move ordering scores (see AI.ordered). History scores are below ORDER_STATIC
+ORDER_BEST = 1 << 32
+ORDER_KILLER = 1 << 31
+ORDER_STATIC = 1 << 24
 
 
 class AI:
     """ This class implements the game AI.
     It could be use to implement an Strategy pattern
     """
-    def __init__(self, pawn, level=1):
+    parallel = True  # Whether it can search in several processes (see ai.smp and ai.distributed)
+    transpositions = True  # Whether it uses a transposition table
+
+    def __init__(self, pawn, level=1, on_progress=None, tt=None, threads=None):
         self.level = level  # Level of difficulty
-        self.board = pawn.board
-        if cfg.CACHE_ENABLED:
-            self._memoize_think = PersistentDict(cfg.CACHE_AI_FNAME, flag='c')
-        else:
-            self._memoize_think = {}
+        self.game = pawn.game
+        self.pawn_id = pawn.id  # Player moved by this AI
+        self.on_progress = on_progress  # Called with the player id as the search advances
+
+        # Wall candidates pruning (see zone_walls)
+        self.zone_radius = cfg.AI_ZONE_RADIUS  # None to disable it
+        self.exhaustive_root = cfg.AI_EXHAUSTIVE_ROOT  # Whether to not prune at the root
+        self.nodes_generated = 0  # Nodes which generated walls
+        self.branches_before = 0  # Pawn moves and walls not colliding, in those nodes
+        self.branches_after = 0  # Same, once pruned
+
+        # Move ordering (see ordered)
+        self.killers: List[List[int]] = []  # Two last moves causing a cutoff at each ply
+        self.history: List[int] = [0] * (self.game.layout.size + 2 * self.game.layout.num_slots)
+
+        # Iterative deepening (see iterate). If any budget is set, level is ignored
+        self.movetime: Optional[float] = cfg.MOVETIME  # Seconds per move
+        self.max_nodes: Optional[int] = cfg.NODES  # Nodes per move
+        self.nodes = 0  # Nodes searched
+        self.deadline: Optional[float] = None
+        self.node_limit: Optional[int] = None
+        self.stopped = False  # Whether the search ran out of budget
+        self.stop_event = None  # Stops the search once set, if given (i.e. a multiprocessing.Event)
+        self.iterations = 0  # Completed ones in this move
+        self.pv: List[int] = []  # Principal variation of the last completed iteration
+        self.pv_table: List[List[int]] = []  # Principal variation found at each ply
+
+        # Null move pruning and late move reductions counters (see think)
+        self.null_tries = 0
+        self.null_cutoffs = 0
+        self.null_verify_fails = 0  # Null move cutoffs refuted by the verification search
+        self.lmr_reductions = 0
+        self.lmr_researches = 0  # Reduced moves searched again at full depth
+
+        # Transposition table. With several threads, a shared one (see ai.smp)
+        threads = cfg.AI_THREADS if threads is None else threads
+        self.smp = LazySMP(self, threads - 1) if threads > 1 and self.parallel else None
+        if tt is not None:
+            self.tt = tt
+        elif self.smp is None:
+            self.tt = TranspositionTable(cfg.TT_SIZE) if self.transpositions else None
+
+        # Distributed search (see ai.distributed). AIs given a table are helpers of another one
+        self.cluster = (Coordinator(self, cfg.AI_DIST_WORKERS) if cfg.AI_DISTRIBUTED and self.parallel and tt is None
+                        else None)
+
+        # Pondering (see ponder): searching on the opponent time
+        self.ponderer: Optional[AI] = None  # AI searching a copy of the game, with this one table
+        self.ponder_thread: Optional[threading.Thread] = None
+        self.ponder_stop = threading.Event()
+        self.ponder_reply: Optional[int] = None  # Opponent action expected
+        self.ponder_key: Optional[int] = None  # Game key of the position pondered
+        self.ponder_result: Tuple[Optional[int], int] = (None, 0)
+        self.ponder_hits = 0
+        self.ponder_misses = 0
+
+        if self.tt is not None and tt is None and cfg.CACHE_ENABLED and os.path.exists(cfg.CACHE_AI_FNAME):
+            try:
+                self.tt.load(cfg.CACHE_AI_FNAME)
+            except (OSError, ValueError) as e:
+                log('Could not load AI cache: {}'.format(e), LogLevel.WARN)
 
         pawn.AI = self
         log('Player %i is moved by computers A.I. with level %i' % (pawn.id, level), LogLevel.INFO)
 
     @property
     def available_actions(self) -> List[Union[ActionPlaceWall, ActionMovePawn]]:
-        player = self.pawn
-        result = [ActionMovePawn(player.coord, x) for x in player.valid_moves]
+        return [self.game.decode_action(code) for code in self.actions()]
 
-        if not player.walls:  # Out of walls?
-            return result
+    def zone_walls(self) -> int:
+        """ Returns the mask of walls (see engine.bitboard.wall_index) within
+        zone_radius cells of the pawns or their shortest paths, plus those
+        touching the walls on board. Walls out of it are unlikely good moves.
+        """
+        game = self.game
+        lay = game.layout
+        squares = 0
+        for pawn in game.pawns:
+            squares |= pawn.bit | pawn.distances.shortest_paths()[0]
+
+        result = lay.walls_around(lay.dilate(squares, self.zone_radius))
+        for horiz, mask in ((False, game.vwalls), (True, game.hwalls)):
+            while mask:
+                low = mask & -mask
+                mask ^= low
+                result |= lay.adjacent_walls[wall_index(low.bit_length() - 1, horiz)]
+
+        return result
+
+    def pruned(self, ilevel: int) -> bool:
+        """ Whether the wall candidates at the given ply are pruned (see
+        zone_walls): at every one but the root, unless exhaustive_root is unset
+        """
+        return bool(ilevel) or not self.exhaustive_root
 
-        k = self.board.state[1 + 4 * len(self.board.pawns):]
-        try:
-            return result + core.MEMOIZED_WALLS[k]
-        except KeyError:
-            pass
+    def root_actions(self, best: Optional[int] = None) -> List[int]:
+        """ Available actions at the root of the search, ordered (see
+        ordered) with the given best one first
+        """
+        return self.ordered(list(self.actions(self.pruned(0))), 0, best)
 
-        color = self.board[0][0].wall_color
-        tmp: List[Union[ActionPlaceWall, ActionMovePawn]] = []
+    def branching_factor(self) -> Tuple[float, float]:
+        """ Average number of actions per node (those generating walls)
+        before and after pruning the wall candidates. Walls counted are the ones not
+        colliding with others (their legality is not checked).
+        """
+        if not self.nodes_generated:
+            return 0.0, 0.0
+
+        return self.branches_before / self.nodes_generated, self.branches_after / self.nodes_generated
 
-        for i in range(self.board.rows - 1):
-            for j in range(self.board.cols - 1):
-                for horiz in (False, True):
-                    wall = Wall(self.board.screen, self.board, color, Coord(i, j), horiz)
-                    if self.board.can_put_wall(wall):
-                        tmp.append(ActionPlaceWall(wall))
+    def actions(self, prune: bool = False) -> Iterator[int]:
+        """ Generates the available action codes (see Game.encode_action)
+        lazily: pawn moves and then the legal wall_candidates(). A wall
+        legality is checked only when it is about to be yielded, so a search
+        cut off early skips the rest of the checks.
+        The game must be back to the same state whenever the generator is resumed.
+        """
+        yield from self.pawn.move_squares
 
-        core.MEMOIZED_WALLS[k] = tmp
-        return result + tmp
+        size = self.game.layout.size
+        memo = self.wall_memo()
+        for action in self.wall_candidates(prune):
+            if self.legal_wall(action - size, memo):
+                yield action
 
-    def clean_memo(self):
-        """ Removes useless state from the memoized cache.
+    def candidates(self, prune: bool = False) -> List[int]:
+        """ Returns the action codes which might be available: pawn moves
+        and wall_candidates(), whose legality is not checked yet
         """
-        if cfg.CACHE_ENABLED:
-            return  # Do not delete anything if cache enabled
+        return self.pawn.move_squares + self.wall_candidates(prune)
 
-        L = 1 + len(self.board.pawns) * 4
-        k = self.board.state[L:]
-        k = '.' * L + k.replace('1', '.') + '$'
-        r = re.compile(k)
+    def wall_candidates(self, prune: bool = False) -> List[int]:
+        """ Returns the action codes of the walls colliding with none on
+        board: first those near the opponent, and then the remaining ones.
+        Their legality (whether they leave a path to the goals) is not checked
+        (see legal_wall). If prune is set, only walls within zone_walls() are.
+        """
+        result = []
+        if not self.pawn.walls:  # Out of walls?
+            return result
 
-        for q in list(self._memoize_think.keys()):
-            if not r.match(q):
-                del self._memoize_think[q]
+        game = self.game
+        free = game.free_walls
+        moves = len(self.pawn.move_squares)
+        self.nodes_generated += 1
+        self.branches_before += moves + bin(free).count('1')
+        if prune and self.zone_radius is not None:
+            free &= self.zone_walls()
+        self.branches_after += moves + bin(free).count('1')
+
+        opponent = game.pawns[(game.player + 1) % game.num_players]
+        near = game.layout.near_walls[opponent.square]
+        size = game.layout.size
+
+        for stage in (free & near, free & ~near):
+            while stage:
+                low = stage & -stage
+                stage ^= low
+                result.append(size + low.bit_length() - 1)
+
+        return result
+
+    def wall_memo(self) -> List[int]:
+        """ Masks of the walls checked and legal (see legal_wall) with the
+        current walls and pawns on board
+        """
+        game = self.game
+        k = (game.wall_key,) + tuple([pawn.bit for pawn in game.pawns])  # Which pawn is where matters
+        memo = core.MEMOIZED_WALLS.get(k)
+        if memo is None:
+            memo = [0, 0]
+            core.MEMOIZED_WALLS.put(k, memo)
+
+        return memo
+
+    def legal_wall(self, index: int, memo: List[int]) -> bool:
+        """ Whether the wall of the given index (see wall_index), which
+        collides with none on board, leaves every pawn a path to its goal.
+        The result is memoized in the given wall_memo()
+        """
+        low = 1 << index
+        if not memo[0] & low:
+            memo[0] |= low
+            if self.game.can_put_wall_index(index):
+                memo[1] |= low
+
+        return bool(memo[1] & low)
+
+    def ordered(self, actions: List[int], ply: int, best: Optional[int] = None) -> List[int]:
+        """ Sorts the actions to search first those more likely to cause a
+        cutoff: the given best one (i.e. from the transposition table), then
+        the killer moves of this ply, and then the rest by history score.
+        If AI_ORDER_STATIC is set, pawn moves approaching the goal and walls
+        cutting others shortest paths go before the rest (see ORDER_* scores).
+        Ties keep the generation order.
+        """
+        while len(self.killers) <= ply:
+            self.killers.append([-1, -1])
+
+        killers = self.killers[ply]
+        history = self.history
+        scores = {best: ORDER_BEST, killers[0]: ORDER_KILLER, killers[1]: ORDER_KILLER - 1}
+        static_walls = 0
+        closer = 0
+        size = self.game.layout.size
+
+        if cfg.AI_ORDER_STATIC:
+            p = self.pawn
+            array = p.distances.array
+            dist = array[p.square]
+            for sq in p.move_squares:
+                if array[sq] < dist:
+                    closer |= 1 << sq
+
+            for pawn in self.game.pawns:
+                if pawn is not p:
+                    static_walls |= pawn.distances.shortest_path_walls()
+
+        def score(action: int) -> int:
+            result = scores.get(action)
+            if result is not None:
+                return result
+
+            if action < size:
+                bonus = ORDER_STATIC if (closer >> action) & 1 else 0
+            else:
+                bonus = ORDER_STATIC if (static_walls >> (action - size)) & 1 else 0
+
+            return bonus + history[action]
+
+        return sorted(actions, key=score, reverse=True)
+
+    def cutoff(self, action: int, ply: int, depth: int) -> None:
+        """ Records the action caused a cutoff (see ordered)
+        """
+        killers = self.killers[ply]
+        if killers[0] != action:
+            killers[1] = killers[0]
+            killers[0] = action
+
+        self.history[action] = min(self.history[action] + depth * depth, ORDER_STATIC - 1)
+
+    def leaves(self, prune: bool = False) -> Iterator[Tuple[int, int, int]]:
+        """ Generates (action, h1, hh1) for every available action: the
+        shortest path length of the current player and the minimum one of
+        the others once it is done. See actions() for prune.
+        Walls cutting no shortest path are not evaluated at all, and the
+        remaining ones are evaluated in batches if NumPy is available.
+        """
+        game = self.game
+        p = self.pawn
+        size = game.layout.size
+        use_batch = batch.AVAILABLE and cfg.AI_BATCH_LEAVES
+        actions = self.actions(prune)
+
+        def evaluate(action: int) -> Tuple[int, int, int]:
+            game.make(action)
+            game.update_pawns_distances()
+            h1 = p.distances.shortest_path_len
+            hh1 = min([pawn.distances.shortest_path_len for pawn in game.pawns if pawn is not p])
+            game.unmake(action)
+            return action, h1, hh1
+
+        for action in actions:
+            if action >= size:
+                break
+
+            yield evaluate(action)
+        else:
+            return  # No walls
+
+        # Walls cutting no shortest path nor changing the pawns moves leave the
+        # heuristic as it is now
+        relevant = 0
+        for pawn in game.pawns:
+            relevant |= pawn.distances.shortest_path_walls() | game.layout.touching_walls[pawn.square]
+
+        h0 = p.distances.shortest_path_len
+        hh0 = min([pawn.distances.shortest_path_len for pawn in game.pawns if pawn is not p])
+
+        walls = itertools.chain([action], actions)  # Legality is checked as they are reached
+        if not use_batch:
+            for action in walls:
+                yield evaluate(action) if (relevant >> (action - size)) & 1 else (action, h0, hh0)
+            return
+
+        others = [i for i, pawn in enumerate(game.pawns) if pawn is not p]
+        while True:  # Next chunk, up to AI_BATCH_SIZE walls to evaluate. A cutoff skips the remaining ones
+            chunk = []
+            pending = []
+            for action in walls:
+                chunk.append(action)
+                if (relevant >> (action - size)) & 1:
+                    pending.append(action)
+                    if len(pending) == cfg.AI_BATCH_SIZE:
+                        break
+
+            if not chunk:
+                return
+
+            values = {}
+            if len(pending) >= cfg.AI_BATCH_MIN:
+                lengths = batch.wall_path_lengths(game, [x - size for x in pending])
+                values.update(zip(pending, zip(lengths[game.player].tolist(), lengths[others].min(axis=0).tolist())))
+
+            for action in chunk:
+                if not (relevant >> (action - size)) & 1:
+                    yield action, h0, hh0
+                elif action in values:
+                    yield (action,) + values[action]
+                else:  # Too few to batch them
+                    yield evaluate(action)
 
     def move(self) -> Tuple[Action, int]:
         """ Return best move according to the deep level
         """
         for coord in self.pawn.valid_moves:
             if coord in self.pawn.goals:
-                return ActionMovePawn(self.pawn.coord, coord), -INF
+                return ActionMovePawn(self.pawn.coord, coord), WIN
 
         self.pawn.percent = 0  # Percentage done
-        move, h, alpha, beta = self.think(bool(self.level % 2))
-        self.clean_memo()
-        self.distances.clean_memo()
-        return move, h
-
-    def do_action(self, action: Union[ActionPlaceWall, ActionMovePawn]):
-        """ Simulates the action en background
-        """
-        if isinstance(action, ActionPlaceWall):
-            self.board.putWall(self.board.new_wall(action.coord, action.horiz))
-            self.pawn.walls -= 1
+        pondered = self.stop_pondering()
+        self.tt.new_search()
+        self.killers.clear()
+        self.history = [x >> 1 for x in (pondered or self).history]  # Older searches count less
+        self.pv = list(pondered.pv) if pondered is not None else []
+
+        # A ponder hit carries on its search (see iterate)
+        start, best, value = (pondered.iterations,) + self.ponder_result if pondered is not None else (0, None, 0)
+        budget = self.movetime is not None or self.max_nodes is not None
+        if pondered is not None and not budget and pondered.iterations > self.level:
+            move, h = self.ponder_result  # Already searched deep enough
+        elif self.cluster is not None:
+            move, h = self.cluster.iterate(cfg.AI_MAX_DEPTH if budget else self.level, start, best, value)
+        elif self.smp is not None:  # Every process deepens iteratively, to share the results
+            depth = cfg.AI_MAX_DEPTH if budget else self.level
+            self.smp.start(depth)
+            try:
+                move, h = self.iterate(depth, start, best, value)
+            finally:
+                self.smp.finish()
+        elif budget:
+            move, h = self.iterate(start=start, best=best, value=value)
+        elif pondered is not None:
+            move, h = self.iterate(self.level, start, best, value)
         else:
-            self.pawn.move_to(action.dest)
-
-    def undo_action(self, action: Union[ActionPlaceWall, ActionMovePawn]):
-        """ Reverts a given action
+            move, h = self.search(self.level)
+            self.pv = self.pv_table[0]
+
+        self.stopped = False
+        if move is None:  # Stopped before any action was searched. Just run
+            array = self.distances.array
+            move = min(self.pawn.move_squares, key=lambda sq: array[sq])
+
+        return self.game.decode_action(move), h
+
+    def search(self, depth: int, guess: Optional[int] = None) -> Tuple[Optional[int], int]:
+        """ Searches the current position to the given depth (level) and
+        returns the best action and its value (see think).
+        If a guess of the value is given, the search starts with an aspiration
+        window around it, and is repeated with the whole window if the value
+        falls out of it.
         """
-        if isinstance(action, ActionPlaceWall):
-            self.board.removeWall(self.board.new_wall(action.coord, action.horiz))
-            self.pawn.walls += 1
-        else:
-            self.pawn.move_to(action.orig)
-
-    def think(self, is_max: bool, ilevel=0, alpha=INF, beta=-INF):
-        """ Returns best movement with the given level of
-        analysis, and returns it as a Wall (if a wall
-        must be put) or as a coordinate pair.
-
-        MAX is a boolean with tells if this function is
-        looking for a MAX (True) value or a MIN (False) value.
+        if guess is not None and cfg.AI_ASPIRATION_WINDOW:
+            alpha, beta = guess - cfg.AI_ASPIRATION_WINDOW, guess + cfg.AI_ASPIRATION_WINDOW
+            move, value = self.think(depth, 0, alpha, beta, on_pv=True)
+            if self.stopped or alpha < value < beta:
+                return move, value
+
+        return self.think(depth, 0, on_pv=True)
+
+    def iterate(self, max_depth: int = cfg.AI_MAX_DEPTH, start: int = 0, best: Optional[int] = None,
+                value: int = 0) -> Tuple[Optional[int], int]:
+        """ Iterative deepening: searches level 0, 1, 2... until the time
+        or nodes budget runs out (or max_depth is done), and returns the best
+        action and value of the last completed one. Each iteration principal
+        variation is tried first in the next one, and its value is the
+        aspiration window guess. To carry on a previous search, give its
+        iterations done (start), and the best action and value found.
         """
-        k = str(ilevel) + self.board.state[1:]
+        start_time = time.monotonic()
+        self.deadline = start_time + self.movetime if self.movetime is not None else None
+        self.node_limit = self.nodes + self.max_nodes if self.max_nodes is not None else None
+        h, guess = value, (value if best is not None else None)
+        self.iterations = start
+        nodes = self.nodes
+
         try:
-            r = self._memoize_think[k]
-            core.MEMOIZED_NODES_HITS += 1
-            return r
-        except KeyError:
-            core.MEMOIZED_NODES += 1
-            pass
+            for depth in range(start, max_depth + 1):
+                move, value = self.search(depth, guess)
+                if self.stopped:
+                    break
+
+                best, h, guess = move, value, value
+                self.iterations += 1
+                self.pv = self.pv_table[0]
+                log('Depth %i: %s (%i), %i nodes, %.2fs' % (depth, self.game.decode_action(move), value,
+                                                           self.nodes - nodes, time.monotonic() - start_time),
+                    LogLevel.DEBUG)
 
+                if self.deadline is not None and time.monotonic() - start_time > self.movetime / 2:
+                    break  # Next iteration wouldn't finish
+        finally:
+            self.deadline = self.node_limit = None
+            self.stopped = False
+
+        return best, h
+
+    def out_of_budget(self) -> bool:
+        """ Whether the search must be stopped. The first iteration never is
+        for running out of budget, but it is once stop_event is set
+        """
+        if self.stop_event is not None and not self.nodes & 0xFF and self.stop_event.is_set():
+            return True
+
+        if not self.iterations:
+            return False
+
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            return True
+
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def think(self, depth: int, ilevel=0, alpha=-INF, beta=INF, on_pv=False,
+              null_move=True) -> Tuple[Optional[int], int]:
+        """ Negamax search with alpha-beta pruning and principal variation search,
+        depth plies ahead (0 = just evaluate each action) from ply ilevel.
+        Returns the best action for the player to move and its value for it
+        (the higher the better): the other players minimum distance to their
+        goal minus its own one, once the last action searched is done, or WIN
+        (minus the plies to it) if it reaches the goal.
+        The value is searched within (alpha, beta). Out of it, it's just a bound
+        of the actual value (fail soft).
+        on_pv tells whether the node follows the last principal variation, and
+        null_move whether a null move can be tried (see AI_NULL_MOVE).
+        """
+        self.nodes += 1
+        while len(self.pv_table) <= ilevel + 1:
+            self.pv_table.append([])
+        self.pv_table[ilevel] = []
+
+        if self.stopped or (self.deadline is not None or self.node_limit is not None or
+                            self.stop_event is not None) and self.out_of_budget():
+            self.stopped = True
+            return None, 0
+
+        game = self.game
+        key = game.key
+        entry = self.tt.probe(key)
+        move = None
+        if entry is not None:
+            e_depth, value, bound, move = entry
+            value = self.from_tt(value, ilevel)
+            if ilevel and e_depth >= depth and (  # The root must search, to get its PV
+                    bound == EXACT or
+                    bound == LOWER and value >= beta or
+                    bound == UPPER and value <= alpha):
+                core.MEMOIZED_NODES_HITS += 1
+                return move, value
+
+        core.MEMOIZED_NODES += 1
+        prune = self.pruned(ilevel)
+        window = alpha, beta
+        player = game.current_player
+        goals = player.goal_mask
+        size = game.layout.size
         result = None
-        # __DEBUG__
-        # print(alpha, beta)
-        stop = False
-
-        if ilevel >= self.level:  # OK we must return the movement
-            HH = INF
-            h0 = self.distances.shortest_path_len
-            hh0 = self.board.pawns[(self.board.player + 1) % 2].distances.shortest_path_len
-            # next_player = (self.board.player + 1) % len(self.board.pawns)
-
-            for action in self.available_actions:
-                self.do_action(action)
-
-                p = self.pawn
-                self.board.update_pawns_distances()
-                h1 = self.distances.shortest_path_len
-                hh1 = min([pawn.distances.shortest_path_len
-                           for pawn in self.board.pawns if pawn is not p])
-                h = h1 - hh1  # The heuristic value
-
-                # OK h => my minimum distance - minimum one of the player nearest
-                # to the goal. So the smallest (NEGATIVE) h the better for ME,
-                # If we are in a MIN level
-
-                if is_max:
-                    h = -h
-                    if h > HH:
-                        HH = h
-                        result = action
-
-                        if HH >= alpha:
-                            HH = alpha
-                            stop = True
-                elif h < HH:  # MIN
-                    HH = h
-                    result = action
+        best = -INF
 
-                    if HH <= beta:
-                        HH = beta
-                        stop = True
+        if depth <= 0:  # Leaf: evaluate every action
+            h0 = player.distances.shortest_path_len
+            hh0 = min([pawn.distances.shortest_path_len for pawn in game.pawns if pawn is not player])
 
-                elif self.level == 0 and h == HH and h1 <= h0 and hh1 > hh0:
+            for action, h1, hh1 in self.leaves(prune):
+                value = WIN - ilevel if action < size and (goals >> action) & 1 else hh1 - h1
+
+                if result is None or value > best:
+                    best, result = value, action
+                    if value >= beta:
+                        break
+
+                # When there's nothing better, rather lengthen the opponent path
+                elif not ilevel and value == best and h1 <= h0 and hh1 > hh0:
                     result = action
 
-                self.undo_action(action)
-                if stop:
-                    break
+            self.tt.store(key, 0, self.to_tt(best, ilevel), self.bound(best, window), result)
+            self.pv_table[ilevel] = [result]
+            return result, best
 
-            self._memoize_think[k] = result, HH, alpha, beta
-            return result, HH, alpha, beta
+        # Not a leaf in the search tree
+        if null_move and ilevel and beta - alpha == 1 and cfg.AI_NULL_MOVE and depth >= cfg.AI_NULL_MOVE_DEPTH:
+            cutoff = self.null_move(depth, ilevel, alpha, beta)
+            if cutoff is not None:
+                return cutoff
 
-        # Not a leaf in the search tree. Alpha-Beta minimax
-        HH = -INF if is_max else INF
-        player = self.board.current_player
         player.distances.push_state()
-        r = self.available_actions
+        pv_move = self.pv[ilevel] if on_pv and ilevel < len(self.pv) else None
+        best_move = pv_move if pv_move is not None else move
+        r = self.ordered(self.candidates(prune), ilevel, best_move)  # Walls legality is checked when reached
+        memo = self.wall_memo()
+        killers = self.killers[ilevel]
         count_r = 0
         L = float(len(r))
+        i = -1  # Legal actions searched
 
         for action in r:
             if not ilevel and player.percent is not None:
@@ -185,57 +549,219 @@ class AI:
                 player.percent = count_r / L  # [0..1]
                 if cfg.__DEBUG__:
                     log('Player %i is thinking: %2.0f%% done.' % (player.id, player.percent * 100))
-                self.board.draw_player_info(player.id)
-
-            self.do_action(action)
-            self.board.next_player()
-            dummy, h, alpha1, beta1 = self.think(not is_max, ilevel + 1, alpha, beta)
-            # __DEBUG__
-            # print action, '|', dummy, h, '<<<'
-            self.previous_player()
-
-            if is_max:
-                # __DEBUG__
-                # print h, HH
-                if h > HH:  # MAX
-                    result, HH = action, h
-                    if HH >= alpha:
-                        HH = alpha
-                        stop = True
-                    else:
-                        beta = HH
+                if self.on_progress is not None:
+                    self.on_progress(player.id)
+
+            if action >= size and not self.legal_wall(action - size, memo):
+                continue
+
+            i += 1
+            if action < size and (goals >> action) & 1:
+                value = WIN - ilevel  # No need to go on
+                self.pv_table[ilevel + 1] = []
             else:
-                if h < HH:  # MIN
-                    result, HH = action, h
-                    if HH <= beta:
-                        HH = beta
-                        stop = True
-                    else:
-                        alpha = HH
-
-            self.undo_action(action)
-            if stop:
-                break
+                game.make(action)
+                game.next_player()
+                child_pv = on_pv and action == pv_move
+                if result is None:
+                    value = -self.think(depth - 1, ilevel + 1, -beta, -alpha, child_pv)[1]
+                else:  # Just prove it's not better than the best one so far (null window)
+                    # Late moves are unlikely to be better. Search them shallower first (LMR)
+                    reduction = (cfg.AI_LMR_REDUCTION if cfg.AI_LMR and i >= cfg.AI_LMR_MOVES and
+                                 depth >= cfg.AI_LMR_DEPTH and action != best_move and action not in killers
+                                 else 0)
+                    value = -self.think(depth - 1 - reduction, ilevel + 1, -alpha - 1, -alpha, child_pv)[1]
+                    if reduction:
+                        self.lmr_reductions += 1
+                        if value > alpha and not self.stopped:
+                            self.lmr_researches += 1
+                            value = -self.think(depth - 1, ilevel + 1, -alpha - 1, -alpha, child_pv)[1]
+
+                    if alpha < value < beta and not self.stopped:
+                        value = -self.think(depth - 1, ilevel + 1, -beta, -alpha, child_pv)[1]
+
+                game.previous_player()
+                game.unmake(action)
+                if self.stopped:
+                    break
+
+            if result is None or value > best:
+                best, result = value, action
+                self.pv_table[ilevel] = [action] + self.pv_table[ilevel + 1]
+                if value > alpha:
+                    alpha = value
+                    if value >= beta:
+                        self.cutoff(action, ilevel, depth)
+                        break
 
         player.distances.pop_state()
-        self._memoize_think[k] = result, HH, alpha, beta
-        # DEBUG__
-        # print(result)
-        return result, HH, alpha, beta
+        if self.stopped:
+            return result, best
+
+        self.tt.store(key, depth, self.to_tt(best, ilevel), self.bound(best, window), result)
+        return result, best
+
+    def null_move(self, depth: int, ilevel: int, alpha: int, beta: int) -> Optional[Tuple[Optional[int], int]]:
+        """ Null move pruning: if the player to move is doing so well that
+        even passing the turn, a shallower search fails high (>= beta), the node
+        is cut off. As passing might be better than any move (zugzwang), the
+        cutoff is verified with a shallower search without null moves, unless
+        AI_NULL_MOVE_VERIFY is unset. Returns the think result if cut off.
+        """
+        game = self.game
+        player = game.current_player
+        static = min([pawn.distances.shortest_path_len for pawn in game.pawns if pawn is not player])
+        if static - player.distances.shortest_path_len < beta:
+            return None  # Unlikely to fail high
+
+        self.null_tries += 1
+        reduction = cfg.AI_NULL_MOVE_REDUCTION
+        game.next_player()
+        value = -self.think(depth - 1 - reduction, ilevel + 1, -beta, -beta + 1, null_move=False)[1]
+        game.previous_player()
+        if self.stopped or value < beta:
+            return None
+
+        move = None
+        if cfg.AI_NULL_MOVE_VERIFY:
+            move, value = self.think(depth - reduction, ilevel, alpha, beta, null_move=False)
+            if self.stopped or value < beta:
+                self.null_verify_fails += 1
+                return None
+
+        self.null_cutoffs += 1
+        self.tt.store(game.key, depth, self.to_tt(value, ilevel), LOWER, move)
+        return move, value
+
+    @staticmethod
+    def to_tt(value: int, ilevel: int) -> int:
+        """ Value to store in the transposition table for a node at ply
+        ilevel: wins and losses counted in plies from the node, instead of
+        from the root, as the node might be probed at another ply
+        """
+        if value >= WIN_BOUND:
+            return value + ilevel
+
+        if value <= -WIN_BOUND:
+            return value - ilevel
+
+        return value
+
+    @staticmethod
+    def from_tt(value: int, ilevel: int) -> int:
+        """ Value of a node at ply ilevel stored in the transposition table
+        (see to_tt)
+        """
+        if value >= WIN_BOUND:
+            return value - ilevel
+
+        if value <= -WIN_BOUND:
+            return value + ilevel
+
+        return value
+
+    @staticmethod
+    def bound(value: int, window: Tuple[int, int]) -> int:
+        """ Returns the bound type of a value searched within the given
+        (alpha, beta) window (fail soft)
+        """
+        if value <= window[0]:
+            return UPPER
+
+        if value >= window[1]:
+            return LOWER
+
+        return EXACT
 
     @property
     def pawn(self):
-        return self.board.current_player
+        return self.game.current_player
 
     @property
     def distances(self):
         return self.pawn.distances
 
-    def previous_player(self):
-        """ Switches to previous player.
+    def ponder(self) -> None:
+        """ Starts searching in the background, while the opponent thinks,
+        the position after its expected reply: the best one stored in the
+        transposition table, or else the one in the principal variation.
+        It must be called with the opponent to move. See stop_pondering.
+        """
+        self.stop_pondering()
+        game = self.game
+        entry = self.tt.probe(game.key)
+        reply = entry[3] if entry is not None else self.pv[1] if len(self.pv) > 1 else None
+        if reply is None:
+            return
+
+        if self.ponderer is None:
+            copy = Game(game.rows, game.cols)
+            self.ponderer = AI(copy.pawns[self.pawn_id], self.level, tt=self.tt, threads=1)
+            self.ponderer.movetime = self.ponderer.max_nodes = None  # Until stopped
+            self.ponderer.stop_event = self.ponder_stop
+
+        ponderer = self.ponderer
+        ponderer.game.state = game.state
+        if reply not in ponderer.actions():
+            return
+
+        ponderer.game.make(reply)
+        ponderer.game.next_player()
+        self.ponder_reply = reply
+        self.ponder_key = ponderer.game.key
+        self.ponder_result = None, 0
+        ponderer.killers.clear()
+        ponderer.history = list(self.history)
+        ponderer.pv = self.pv[2:]
+        self.ponder_stop.clear()
+        self.ponder_thread = threading.Thread(target=self.pondering, daemon=True)
+        self.ponder_thread.start()
+
+    def pondering(self) -> None:
+        """ Pondering thread
         """
-        self.board.player = (self.board.player + self.board.num_players - 1) % self.board.num_players
+        self.tt.new_search()
+        self.ponder_result = self.ponderer.iterate()
+
+    def pause_pondering(self) -> None:
+        """ Stops the pondering search, if any, so the game can be changed.
+        stop_pondering tells later whether it was a ponder hit
+        """
+        if self.ponder_thread is not None:
+            self.ponder_stop.set()
+            self.ponder_thread.join()
+
+    def stop_pondering(self) -> Optional['AI']:
+        """ Stops pondering, if it was. Returns the AI which pondered if
+        it searched the current position (ponder hit), or None
+        """
+        if self.ponder_thread is None:
+            return None
+
+        self.pause_pondering()
+        self.ponder_thread = None
+        self.ponderer.game.previous_player()
+        self.ponderer.game.unmake(self.ponder_reply)
+        if self.ponder_key != self.game.key or self.ponder_result[0] is None:
+            self.ponder_misses += 1
+            return None
+
+        self.ponder_hits += 1
+        log('Ponder hit: %i iterations done' % self.ponderer.iterations, LogLevel.DEBUG)
+        return self.ponderer
 
     def flush_cache(self):
-        if isinstance(self._memoize_think, PersistentDict):
-            self._memoize_think.close()
+        if cfg.CACHE_ENABLED and self.tt is not None:
+            self.tt.save(cfg.CACHE_AI_FNAME)
+
+    def close(self):
+        """ Stops pondering, and the helper and worker processes, if any
+        """
+        self.stop_pondering()
+        if self.smp is not None:
+            self.smp.close()
+            self.smp = None
+
+        if self.cluster is not None:
+            self.cluster.close()
+            self.cluster = None
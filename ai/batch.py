@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+from functools import lru_cache
+from typing import List
+
+from config import DIR, INF
+from engine.bitboard import Layout, wall_index
+
+try:
+    import numpy as np
+except ImportError:  # Optional. Without it leaves are evaluated one by one
+    np = None
+
+__doc__ = """ Batched leaf evaluation with NumPy.
+
+Instead of putting each candidate wall and computing the distances again, the
+blocked edges of every candidate are stacked into (candidates x rows x cols)
+boolean tensors, and a single breadth first search is run over all of them.
+"""
+
+AVAILABLE = np is not None
+
+
+def to_array(lay: Layout, mask: int):
+    """ Square mask as a (rows x cols) boolean array
+    """
+    data = np.frombuffer(mask.to_bytes((lay.size + 7) >> 3, 'little'), dtype=np.uint8)
+    return np.unpackbits(data, bitorder='little')[:lay.size].reshape(lay.rows, lay.cols).astype(bool)
+
+
+class WallTensors:
+    """ Edges blocked by every wall (see wall_index), per direction,
+    as (walls x rows x cols) boolean arrays
+    """
+    def __init__(self, lay: Layout):
+        n = 2 * lay.num_slots
+        self.blocked = [np.zeros((n, lay.rows, lay.cols), dtype=bool) for _ in range(4)]
+
+        for slot in range(lay.num_slots):
+            h = wall_index(slot, True)
+            self.blocked[DIR.S][h] = to_array(lay, lay.h_edges[slot])
+            self.blocked[DIR.N][h] = to_array(lay, lay.h_edges[slot] << lay.cols)
+            v = wall_index(slot, False)
+            self.blocked[DIR.W][v] = to_array(lay, lay.v_edges[slot])
+            self.blocked[DIR.E][v] = to_array(lay, lay.v_edges[slot] << 1)
+
+
+@lru_cache(maxsize=None)
+def wall_tensors(lay: Layout) -> WallTensors:
+    """ Returns the (shared) WallTensors of the given layout
+    """
+    return WallTensors(lay)
+
+
+def wall_path_lengths(game, indexes: List[int]):
+    """ Returns, for every pawn and every candidate wall index, the
+    pawn shortest path length (see DistArray.shortest_path_len) once that wall
+    is put, as a (pawns x candidates) array. Walls are not checked for legality.
+    """
+    lay = game.layout
+    tensors = wall_tensors(lay)
+    idx = np.asarray(indexes)
+    count = len(indexes)
+    pawns = game.pawns
+    n = len(pawns) * count  # Every pawn is searched in the same batch, one after another
+    open_ = [np.tile(~(to_array(lay, game.blocked[d]) | tensors.blocked[d][idx]), (len(pawns), 1, 1))
+             for d in range(4)]
+    open_n, open_s, open_e, open_w = (open_[d] for d in (DIR.N, DIR.S, DIR.E, DIR.W))
+
+    # Walls blocking the pawns squares may change their moves (i.e. jumps), so
+    # those are computed apart
+    moves = [[] for _ in pawns]
+    touching = 0
+    for pawn in pawns:
+        touching |= lay.touching_walls[pawn.square]
+
+    for c, index in enumerate(indexes):
+        if (touching >> index) & 1:
+            game.put_wall(index >> 1, index & 1)
+            for p, pawn in enumerate(pawns):
+                moves[p].append((c, pawn.move_squares))
+            game.remove_wall(index >> 1, index & 1)
+
+    base = [pawn.move_squares for pawn in pawns]
+    frontier = np.empty((n, lay.rows, lay.cols), dtype=bool)
+    targets = np.zeros((n, lay.size), dtype=bool)  # Squares whose distance is needed
+    for p, pawn in enumerate(pawns):
+        frontier[p * count:(p + 1) * count] = to_array(lay, pawn.goal_mask)
+        targets[p * count:(p + 1) * count, base[p]] = True
+        for c, squares in moves[p]:
+            targets[p * count + c, squares] = True
+
+    # Breadth first search from the goals, for all the candidates at once
+    dist = np.full(frontier.shape, INF, dtype=np.uint8)
+    seen = frontier.copy()
+    untargeted = ~targets
+    d = 0
+    while True:
+        np.putmask(dist, frontier, d)
+        if (seen.reshape(n, -1) | untargeted).all():
+            break  # Every square needed reached
+
+        step = np.zeros_like(frontier)
+        step[:, :-1, :] |= (frontier & open_n)[:, 1:, :]
+        step[:, 1:, :] |= (frontier & open_s)[:, :-1, :]
+        step[:, :, :-1] |= (frontier & open_e)[:, :, 1:]
+        step[:, :, 1:] |= (frontier & open_w)[:, :, :-1]
+        frontier = step & ~seen
+        if not frontier.any():
+            break
+
+        seen |= frontier
+        d += 1
+
+    flat = dist.reshape(len(pawns), count, -1)
+    result = np.empty((len(pawns), count), dtype=np.int64)
+    for p in range(len(pawns)):
+        result[p] = flat[p][:, base[p]].min(axis=1) if base[p] else INF
+        for c, squares in moves[p]:
+            result[p, c] = flat[p, c, squares].min() if squares else INF
+
+    return result
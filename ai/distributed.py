@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import multiprocessing
+import threading
+import time
+import xmlrpc.client
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple, Union
+
+from helpers import log, LogLevel
+import config as cfg
+import core
+from config import INF
+from network.server import EnhancedServer
+
+from . import apply_settings, settings
+from .tt import TranspositionTable
+
+__doc__ = """ Distributed search, Young Brothers Wait style.
+
+The coordinator (the AI of the player to move) splits the search at the
+root: the first action (eldest brother) is searched alone with the whole
+window, and once its value is known, the remaining ones (young brothers) are
+searched in parallel with a null window, just to prove they are not better.
+Those which do seem better are searched again with the whole window.
+
+Each of these subtrees is a job (position, action, depth and window) put in
+a queue. Workers, in this machine or others, take jobs from the queue
+whenever they are idle, and report back the value and nodes searched. The
+window of queued jobs is narrowed as the best value so far grows, and jobs
+no longer needed (i.e. the time ran out) are cancelled: workers poll them
+while searching. Coordinator and workers talk XML-RPC (see network.server).
+
+A remote worker is started with: python -m ai.distributed URL
+"""
+
+
+class Job:
+    """ Search of the subtree of a root action, within (alpha, beta)
+    """
+    def __init__(self, id_: int, action: int, depth: int, alpha: int, beta: int):
+        self.id = id_
+        self.action = action
+        self.depth = depth
+        self.alpha = alpha
+        self.beta = beta
+        self.value: Optional[int] = None
+
+    @property
+    def null_window(self) -> bool:
+        return self.beta - self.alpha == 1
+
+
+class Coordinator:
+    """ Job queue and root search of the given AI (see Young Brothers
+    Wait above). It starts an XML-RPC server for the workers, and
+    num_workers local ones.
+    """
+    def __init__(self, ai, num_workers: int = 0):
+        self.ai = ai
+        self.lock = threading.Condition()
+        self.pending: Deque[Job] = deque()
+        self.running: Dict[int, Job] = {}
+        self.finished: List[Job] = []
+        self.next_id = 0
+        self.state = None  # Game state being searched
+        self.quit = False
+        self.names = set()  # Of the workers seen
+        self.settings = settings()  # Workers search with them (see ai.settings)
+
+        # Statistics
+        self.nodes = 0  # Searched by the workers
+        self.jobs = 0
+        self.researches = 0  # Young brothers searched again with the whole window
+
+        # Local workers are started before the server, so they don't inherit its
+        # socket nor thread. They are told its URL (port 0 = any free one) afterwards
+        ctx = multiprocessing.get_context()
+        urls = ctx.Queue()
+        self.workers = [ctx.Process(target=local_worker, args=(urls,), daemon=True) for _ in range(num_workers)]
+        for process in self.workers:
+            process.start()
+
+        self.server = EnhancedServer((cfg.AI_DIST_HOST, cfg.AI_DIST_PORT), allow_none=True, logRequests=False)
+        self.server.timeout = 0.5  # So it can be terminated
+        for function in (self.get_work, self.put_result, self.job_alive):
+            self.server.register_function(function)
+        self.server.start()
+        self.url = 'http://%s:%i' % self.server.server_address[:2]
+        log('Distributed search coordinator at %s' % self.url, LogLevel.INFO)
+        for _ in self.workers:
+            urls.put(self.url)
+
+    # --- Worker requests ---
+    def get_work(self, name: str) -> Union[dict, bool, None]:
+        """ Returns the next job for the given worker, None if there's none,
+        or False if the worker must exit
+        """
+        with self.lock:
+            if self.quit:
+                return False
+
+            if name not in self.names:
+                self.names.add(name)
+                log('Worker %s joined' % name, LogLevel.INFO)
+
+            if not self.pending:
+                return None
+
+            job = self.pending.popleft()
+            self.running[job.id] = job
+            game = self.ai.game
+            return {'id': job.id, 'rows': game.rows, 'cols': game.cols, 'state': self.state,
+                    'generation': self.ai.tt.generation, 'action': job.action, 'depth': job.depth,
+                    'alpha': job.alpha, 'beta': job.beta, 'settings': self.settings}
+
+    def put_result(self, job_id: int, value: int, nodes: int) -> bool:
+        """ Reports the value of a job. Returns whether it was still needed
+        """
+        with self.lock:
+            self.nodes += nodes
+            job = self.running.pop(job_id, None)
+            if job is None:
+                return False
+
+            job.value = value
+            self.finished.append(job)
+            self.lock.notify_all()
+            return True
+
+    def job_alive(self, job_id: int) -> bool:
+        """ Whether the given job is still needed
+        """
+        with self.lock:
+            return job_id in self.running
+
+    # --- Search ---
+    def submit(self, action: int, depth: int, alpha: int, beta: int, urgent: bool = False) -> None:
+        with self.lock:
+            job = Job(self.next_id, action, depth, alpha, beta)
+            self.next_id += 1
+            self.jobs += 1
+            if urgent:
+                self.pending.appendleft(job)
+            else:
+                self.pending.append(job)
+
+    def wait(self) -> Optional[Job]:
+        """ Waits for the next job finished. Returns None if the AI runs out of budget
+        """
+        with self.lock:
+            while not self.finished:
+                if self.out_of_budget():
+                    return None
+
+                self.lock.wait(0.05)
+
+            return self.finished.pop(0)
+
+    def out_of_budget(self) -> bool:
+        ai = self.ai
+        if ai.stop_event is not None and ai.stop_event.is_set():
+            return True
+
+        if ai.node_limit is not None and ai.nodes + self.nodes >= ai.node_limit:
+            return True
+
+        return ai.deadline is not None and time.monotonic() >= ai.deadline
+
+    def raise_alpha(self, alpha: int) -> None:
+        """ Narrows the window of the queued jobs to the new best value
+        """
+        with self.lock:
+            for job in self.pending:
+                if job.null_window:
+                    job.alpha, job.beta = alpha, alpha + 1
+                else:
+                    job.alpha = max(job.alpha, alpha)
+
+    def cancel(self) -> None:
+        """ Drops every job. Workers searching them will stop
+        """
+        with self.lock:
+            self.pending.clear()
+            self.running.clear()
+            self.finished.clear()
+
+    def search(self, depth: int, actions: List[int]) -> Optional[Tuple[int, int]]:
+        """ Searches the given root actions (the first one is expected to
+        be the best) to the given depth. Returns the best one and its value
+        (see AI.think), or None if the budget ran out.
+        """
+        self.state = self.ai.game.state
+        try:
+            self.submit(actions[0], depth, -INF, INF)
+            job = self.wait()
+            if job is None:
+                return None
+
+            best, result = job.value, job.action
+            for action in actions[1:]:
+                self.submit(action, depth, best, best + 1)
+
+            outstanding = len(actions) - 1
+            while outstanding:
+                job = self.wait()
+                if job is None:
+                    return None
+
+                outstanding -= 1
+                value = job.value
+                if value <= job.alpha:
+                    continue  # Not better
+
+                if job.null_window:  # It might be better. Search it again
+                    outstanding += 1
+                    self.researches += 1
+                    beta = INF if job.alpha == best else best + 1
+                    self.submit(job.action, depth, best, beta, urgent=True)
+                elif value > best:
+                    best, result = value, job.action
+                    self.raise_alpha(best)
+
+            return result, best
+        finally:
+            self.cancel()
+
+    def iterate(self, max_depth: int, first: int = 0, best: Optional[int] = None,
+                value: int = 0) -> Tuple[Optional[int], int]:
+        """ Iterative deepening (see AI.iterate), from the first depth given
+        (with the best action and value found so far). Shallow iterations
+        are searched locally.
+        """
+        ai = self.ai
+        start = time.monotonic()
+        ai.deadline = start + ai.movetime if ai.movetime is not None else None
+        ai.node_limit = ai.nodes + self.nodes + ai.max_nodes if ai.max_nodes is not None else None
+        h = value
+        ai.iterations = first  # Shallow local iterations (unless carrying on a search) don't run out of budget
+
+        try:
+            for depth in range(first, max_depth + 1):
+                if depth < cfg.AI_DIST_MIN_DEPTH:
+                    move, value = ai.search(depth)
+                    if ai.stopped:
+                        break
+                else:
+                    found = self.search(depth, ai.root_actions(best))
+                    if found is None:
+                        break
+
+                    move, value = found
+
+                best, h = move, value
+                log('Distributed depth %i: %s (%i), %i nodes, %i jobs (%i searched again), %.2fs' %
+                    (depth, ai.game.decode_action(move), value, ai.nodes + self.nodes, self.jobs,
+                     self.researches, time.monotonic() - start), LogLevel.DEBUG)
+
+                if ai.deadline is not None and time.monotonic() - start > ai.movetime / 2:
+                    break  # Next iteration wouldn't finish
+        finally:
+            ai.deadline = ai.node_limit = None
+
+        return best, h
+
+    def close(self) -> None:
+        with self.lock:
+            self.quit = True
+
+        for process in self.workers:
+            process.join()
+
+        self.server.terminate()
+        self.server.thread.join()
+        self.server.server_close()
+
+
+class JobWatch:
+    """ Tells a worker search to stop (see AI.stop_event) once its job
+    is no longer needed
+    """
+    def __init__(self, coordinator, job_id: int):
+        self.coordinator = coordinator
+        self.job_id = job_id
+
+    def is_set(self) -> bool:
+        try:
+            return not self.coordinator.job_alive(self.job_id)
+        except (OSError, xmlrpc.client.Error):
+            return True  # Coordinator gone
+
+
+def worker(url: str) -> None:
+    """ Worker main loop: takes jobs from the coordinator at the given
+    URL and searches them, until it's told to exit or it's unreachable.
+    """
+    from engine.game import Game
+    from .ai import AI
+
+    core.init()
+    coordinator = xmlrpc.client.ServerProxy(url, allow_none=True)
+    name = '%s/%i' % (url, multiprocessing.current_process().pid)
+    game = tt = values = None
+
+    while True:
+        try:
+            job = coordinator.get_work(name)
+        except (OSError, xmlrpc.client.Error):
+            break
+
+        if job is False:
+            break
+
+        if job is None:
+            time.sleep(cfg.AI_DIST_POLL)
+            continue
+
+        if job['settings'] != values:  # Search as the coordinator does
+            values = job['settings']
+            apply_settings(values)
+            cfg.AI_DISTRIBUTED = False
+            game = None
+            tt = TranspositionTable(cfg.TT_SIZE)
+
+        if game is None or (game.rows, game.cols) != (job['rows'], job['cols']):
+            game = Game(job['rows'], job['cols'])
+
+        game.state = job['state']
+        player = game.current_player
+        ai = player.AI
+        if ai is None:
+            ai = AI(player, job['depth'], tt=tt, threads=1)
+
+        if tt.generation != job['generation']:
+            tt.generation = job['generation']
+            ai.killers.clear()
+
+        ai.stop_event = JobWatch(coordinator, job['id'])
+        nodes = ai.nodes
+        value = search_job(ai, job['action'], job['depth'], job['alpha'], job['beta'])
+        ai.stopped = False
+
+        try:
+            coordinator.put_result(job['id'], value, ai.nodes - nodes)
+        except (OSError, xmlrpc.client.Error):
+            break
+
+
+def local_worker(urls) -> None:
+    """ Worker of this machine. Its coordinator URL comes through the given queue
+    """
+    worker(urls.get())
+
+
+def search_job(ai, action: int, depth: int, alpha: int, beta: int) -> int:
+    """ Value of the given root action, as AI.think would search it
+    """
+    game = ai.game
+    player = game.current_player
+    if action < game.layout.size and (player.goal_mask >> action) & 1:
+        return INF  # WIN at the root
+
+    player.distances.push_state()
+    game.make(action)
+    game.next_player()
+    value = -ai.think(depth - 1, 1, -beta, -alpha)[1]
+    game.previous_player()
+    game.unmake(action)
+    player.distances.pop_state()
+    return value
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Quoridor distributed search worker')
+    parser.add_argument('url', help='Coordinator URL, i.e. http://localhost:8000')
+    worker(parser.parse_args().url)
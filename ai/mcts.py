@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+import math
+import random
+import time
+from typing import List, Optional, Tuple
+
+from helpers import log, LogLevel
+import config as cfg
+
+from .action import Action, ActionMovePawn
+from .ai import AI
+
+__doc__ = """ Monte Carlo Tree Search (UCT) game AI.
+
+Each playout goes down the tree choosing the child with the best upper
+confidence bound (UCT), expands one new node and evaluates it with a few
+short random games (rollouts). Pawns run along their shortest paths and,
+now and then, put walls cutting the opponent one. The position they reach
+is scored by the race to the goal (see MCTS.evaluate).
+
+With ~130 walls per position, nodes are widened progressively: a node
+visited n times only has the AI_MCTS_WIDEN_BASE + AI_MCTS_WIDEN * n ** 0.5
+best actions (see AI.ordered) open. The tree is kept between moves, and
+expansion stops once it reaches AI_MCTS_MAX_NODES.
+"""
+
+
+class Node:
+    """ MCTS tree node. Value is the sum of the results of the playouts
+    through it, for the player who did the action leading to it.
+    """
+    __slots__ = ('action', 'parent', 'key', 'children', 'untried', 'visits', 'value', 'terminal')
+
+    def __init__(self, action: Optional[int], parent: Optional['Node'], key: int, terminal: bool = False):
+        self.action = action
+        self.parent = parent
+        self.key = key  # Game key (see engine.zobrist)
+        self.children: List[Node] = []
+        self.untried: Optional[List[int]] = None  # Actions not expanded yet, the best one last
+        self.visits = 0
+        self.value = 0.0
+        self.terminal = terminal  # Whether the action wins
+
+    def best_child(self, exploration: float) -> 'Node':
+        """ Child with the highest upper confidence bound (UCT)
+        """
+        log_n = math.log(self.visits)
+        return max(self.children, key=lambda c: c.value / c.visits + exploration * math.sqrt(log_n / c.visits))
+
+    def size(self) -> int:
+        """ Nodes in this subtree
+        """
+        result = 0
+        todo = [self]
+        while todo:
+            node = todo.pop()
+            result += 1
+            todo.extend(node.children)
+
+        return result
+
+
+class MCTS(AI):
+    """ Monte Carlo Tree Search AI. It plays AI_MCTS_PLAYOUTS << level
+    playouts per move, unless a time or nodes (playouts) budget is set. With
+    both, it stops on whichever runs out first. It uses no transposition table.
+    """
+    parallel = False
+    transpositions = False
+
+    def __init__(self, pawn, level=1, on_progress=None):
+        super().__init__(pawn, level, on_progress)
+        self.root: Optional[Node] = None
+        self.tree_size = 0
+        self.playouts = 0
+        self.rollouts = 0
+        self.random = random.Random(cfg.AI_MCTS_SEED)
+
+    def move(self) -> Tuple[Action, int]:
+        """ Returns the most visited action, and its winning
+        chance estimation (as a percentage)
+        """
+        for coord in self.pawn.valid_moves:
+            if coord in self.pawn.goals:
+                return ActionMovePawn(self.pawn.coord, coord), 100
+
+        start = time.monotonic()
+        self.reuse()
+        playouts = self.playouts
+        # Whichever budget runs out first. With none, the level sets the playouts
+        budget = self.max_nodes
+        if budget is None and self.movetime is None:
+            budget = cfg.AI_MCTS_PLAYOUTS << self.level
+
+        deadline = start + self.movetime if self.movetime is not None else None
+        self.pawn.percent = 0
+
+        while True:
+            done = self.playouts - playouts
+            percent = done / budget if budget is not None else 0
+            if deadline is not None:
+                now = time.monotonic()
+                if now >= deadline and self.root.children:
+                    break
+                percent = max(percent, (now - start) / self.movetime)
+
+            if budget is not None and done >= budget and self.root.children:
+                break
+
+            if self.stop_event is not None and self.stop_event.is_set() and self.root.children:
+                break
+
+            self.playout()
+            if not done % cfg.AI_MCTS_PROGRESS:
+                self.pawn.percent = percent
+                if self.on_progress is not None:
+                    self.on_progress(self.pawn.id)
+
+        best = max(self.root.children, key=lambda c: c.visits)
+        log('MCTS: %i playouts, %i nodes, best %s visited %i times (%.2f), %.2fs' %
+            (self.playouts - playouts, self.tree_size, self.game.decode_action(best.action), best.visits,
+             best.value / best.visits, time.monotonic() - start), LogLevel.DEBUG)
+
+        return self.game.decode_action(best.action), round(100 * best.value / best.visits)
+
+    def ponder(self) -> None:
+        """ Not supported. The tree kept between moves (see reuse) already
+        carries on the search of the expected replies
+        """
+
+    def reuse(self) -> None:
+        """ Makes the root the node of the current position, if it was
+        already in the tree (after the last move and the opponents ones),
+        or a new one
+        """
+        key = self.game.key
+        found = None
+        level = [self.root] if self.root is not None else []
+        for _ in range(self.game.num_players + 1):
+            found = next((node for node in level if node.key == key), None)
+            if found is not None:
+                break
+            level = [child for node in level for child in node.children]
+
+        if found is None:
+            found = Node(None, None, key)
+
+        found.parent = None
+        self.root = found
+        self.tree_size = found.size()
+
+    def playout(self) -> None:
+        """ Selection, expansion, evaluation and backpropagation
+        """
+        game = self.game
+        size = game.layout.size
+        node = self.root
+        path = [node]
+        codes = []
+
+        while not node.terminal:
+            if node.untried is None:
+                node.untried = self.ordered(list(self.actions(True)), 0)[::-1]
+
+            width = cfg.AI_MCTS_WIDEN_BASE + cfg.AI_MCTS_WIDEN * math.sqrt(node.visits)
+            if node.untried and len(node.children) < width and self.tree_size < cfg.AI_MCTS_MAX_NODES:
+                code = node.untried.pop()
+                player = game.current_player
+                terminal = code < size and bool((player.goal_mask >> code) & 1)
+                game.make(code)
+                game.next_player()
+                codes.append(code)
+                node.children.append(Node(code, node, game.key, terminal))
+                self.tree_size += 1
+                node = node.children[-1]
+                path.append(node)
+                break
+
+            if not node.children:
+                break
+
+            node = node.best_child(cfg.AI_MCTS_EXPLORATION)
+            game.make(node.action)
+            game.next_player()
+            codes.append(node.action)
+            path.append(node)
+
+        # Result for the player who did the last action
+        if node.terminal:
+            result = 1.0
+        else:
+            result = 1.0 - sum(self.rollout() for _ in range(cfg.AI_MCTS_ROLLOUTS)) / cfg.AI_MCTS_ROLLOUTS
+
+        for node in reversed(path):
+            node.visits += 1
+            node.value += result
+            result = 1.0 - result
+
+        for code in reversed(codes):
+            game.previous_player()
+            game.unmake(code)
+
+        self.playouts += 1
+
+    def rollout(self) -> float:
+        """ Plays a short random game from the current position. Returns
+        the result for the player to move (1 = win, 0 = loss).
+        """
+        self.rollouts += 1
+        game = self.game
+        rand = self.random
+        size = game.layout.size
+        codes = []
+        result = None
+
+        for ply in range(cfg.AI_MCTS_ROLLOUT_PLIES):
+            player = game.current_player
+            code = None
+            if player.walls and rand.random() < cfg.AI_MCTS_ROLLOUT_WALLS:
+                opponent = game.pawns[(game.player + 1) % game.num_players]
+                code = self.random_wall(opponent.distances.shortest_path_walls() & game.free_walls)
+
+            if code is None:  # Run along a shortest path
+                array = player.distances.array
+                moves = player.move_squares
+                best = min([array[sq] for sq in moves])
+                code = rand.choice([sq for sq in moves if array[sq] == best])
+
+            game.make(code)
+            game.next_player()
+            codes.append(code)
+            if code < size and (player.goal_mask >> code) & 1:
+                result = 0.0 if ply & 1 else 1.0
+                break
+
+        if result is None:
+            result = self.evaluate() if not len(codes) & 1 else 1.0 - self.evaluate()
+
+        for code in reversed(codes):
+            game.previous_player()
+            game.unmake(code)
+
+        return result
+
+    def random_wall(self, walls: int) -> Optional[int]:
+        """ Returns the action code of a legal wall of the given mask
+        (see wall_index) picked at random, if any
+        """
+        game = self.game
+        indexes = []
+        while walls:
+            low = walls & -walls
+            walls ^= low
+            indexes.append(low.bit_length() - 1)
+
+        self.random.shuffle(indexes)
+        for index in indexes[:cfg.AI_MCTS_ROLLOUT_TRIES]:
+            if game.can_put_wall_index(index):
+                return game.layout.size + index
+
+        return None
+
+    def evaluate(self) -> float:
+        """ Winning chance of the player to move. If no more walls were put,
+        it would win the race to the goal if its shortest path is not longer
+        than the opponent one. Walls left count as path the opponent loses.
+        """
+        game = self.game
+        player = game.current_player
+        opponent = game.pawns[(game.player + 1) % game.num_players]
+        lead = (opponent.distances.shortest_path_len - player.distances.shortest_path_len + 0.5 +
+                cfg.AI_MCTS_WALL_VALUE * (player.walls - opponent.walls))
+        return 1.0 / (1.0 + math.exp(-lead / cfg.AI_MCTS_SCALE))
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import queue
+from typing import List, Optional, Set, Tuple
+
+from helpers import log
+import config as cfg
+import core
+
+from . import apply_settings, settings
+
+__doc__ = """ Game AI running in its own process.
+
+The search holds the GIL for seconds, so in a thread it would stall the UI.
+The AIProcess runs the AIs of every computer player in a separate process,
+which receives requests (positions to move or ponder) through a queue, and
+answers with progress and move messages through another one. The UI polls
+them without blocking, and can ask the search to stop now (and play the best
+action found so far) or cancel it at any time.
+"""
+
+
+class RequestFlag:
+    """ Set (see AI.stop_event) once the UI asks to stop the request
+    being searched
+    """
+    def __init__(self, stop_id):
+        self.stop_id = stop_id  # Shared value with the id of the request to stop
+        self.request_id = -1
+
+    def is_set(self) -> bool:
+        return self.stop_id.value == self.request_id
+
+
+def engine_main(rows: int, cols: int, players: List[Tuple[int, int]], settings: dict,
+                requests, responses, stop_id) -> None:
+    """ AI process main loop. Requests are ('move', request id, pawn id,
+    game state), ('ponder', pawn id, game state) or ('quit',). Responses
+    are ('progress', request id, pawn id, percent) and ('move', request id,
+    pawn id, action code, value).
+    """
+    from engine.game import Game
+    from .ai import AI
+    from .mcts import MCTS
+
+    apply_settings(settings)
+
+    core.init()
+    game = Game(rows, cols)
+    flag = RequestFlag(stop_id)
+
+    def on_progress(pawn_id: int) -> None:
+        responses.put(('progress', flag.request_id, pawn_id, game.pawns[pawn_id].percent))
+
+    engine = MCTS if cfg.AI_ENGINE == 'mcts' else AI
+    ais = [engine(game.pawns[pawn_id], level=level, on_progress=on_progress) for pawn_id, level in players]
+    for ai in ais:
+        ai.stop_event = flag
+
+    try:
+        while True:
+            request = requests.get()
+            if request[0] == 'quit':
+                break
+
+            for ai in ais:
+                ai.pause_pondering()  # It mustn't search while the game changes
+
+            if request[0] == 'move':
+                _, flag.request_id, pawn_id, state = request
+                game.state = state
+                action, value = game.pawns[pawn_id].AI.move()
+                responses.put(('move', flag.request_id, pawn_id, game.encode_action(action), value))
+            elif request[0] == 'ponder':
+                _, pawn_id, state = request
+                game.state = state
+                game.pawns[pawn_id].AI.ponder()
+    finally:
+        for ai in ais:
+            ai.flush_cache()
+            ai.close()
+
+        log_stats(ais)
+
+
+def log_stats(ais: list) -> None:
+    log('Memoized nodes: %i' % core.MEMOIZED_NODES)
+    log('Memoized nodes hits: %i' % core.MEMOIZED_NODES_HITS)
+
+    log('Memoized distances: %i' % core.DISTANCES.misses)
+    log('Memoized distances hits: %i' % core.DISTANCES.hits)
+
+    for ai in ais:
+        log('Player %i AI branching factor: %.1f (%.1f before pruning walls)' %
+            ((ai.pawn_id,) + ai.branching_factor()[::-1]))
+        log('Player %i AI null moves: %i cutoffs out of %i (%i refuted), late move reductions: %i '
+            '(%i searched again)' % (ai.pawn_id, ai.null_cutoffs, ai.null_tries, ai.null_verify_fails,
+                                     ai.lmr_reductions, ai.lmr_researches))
+        if cfg.AI_PONDER:
+            log('Player %i AI ponder hits: %i out of %i' %
+                (ai.pawn_id, ai.ponder_hits, ai.ponder_hits + ai.ponder_misses))
+
+
+class RemoteAI:
+    """ Stands for the AI of the given pawn, running in an AIProcess
+    """
+    def __init__(self, pawn, level: int, process: 'AIProcess'):
+        self.pawn_id = pawn.id
+        self.level = level
+        self.process = process
+        pawn.AI = self
+
+
+class AIProcess:
+    """ Runs the AIs of the given (pawn id, level) players of the game
+    in a separate process (see engine_main). Their pawns AI are set to a
+    RemoteAI.
+    """
+    def __init__(self, game, players: List[Tuple[int, int]]):
+        ctx = multiprocessing.get_context()
+        self.requests = ctx.Queue()
+        self.responses = ctx.Queue()
+        self.stop_id = ctx.RawValue('i', -1)
+        self.next_id = 0
+        self.pending: Optional[int] = None  # Id of the move request being searched
+        self.cancelled: Set[int] = set()
+
+        self.process = ctx.Process(target=engine_main, args=(game.rows, game.cols, players, settings(),
+                                                             self.requests, self.responses, self.stop_id))
+        self.process.start()
+        self.ais = [RemoteAI(game.pawns[pawn_id], level, self) for pawn_id, level in players]
+
+    def move(self, pawn_id: int, state: str) -> None:
+        """ Asks for the action of the given player in the given game
+        state (see Game.state). The answer comes through poll()
+        """
+        self.pending = self.next_id
+        self.next_id += 1
+        self.requests.put(('move', self.pending, pawn_id, state))
+
+    def ponder(self, pawn_id: int, state: str) -> None:
+        """ The given player AI ponders (see AI.ponder) in the given game state
+        """
+        self.requests.put(('ponder', pawn_id, state))
+
+    def poll(self) -> List[tuple]:
+        """ Returns the messages received, without waiting: ('progress',
+        pawn id, percent) and ('move', pawn id, action code, value).
+        Those of cancelled requests are dropped. Raises RuntimeError
+        if the AI process exited.
+        """
+        result = []
+        while True:
+            try:
+                message = self.responses.get_nowait()
+            except queue.Empty:
+                if not result and not self.process.is_alive():
+                    raise RuntimeError('AI process exited with code %s' % self.process.exitcode)
+
+                return result
+
+            kind, request_id = message[:2]
+            if request_id in self.cancelled:
+                if kind == 'move':
+                    self.cancelled.discard(request_id)
+                continue
+
+            if kind == 'move' and request_id == self.pending:
+                self.pending = None
+
+            result.append((kind,) + message[2:])
+
+    def stop_now(self) -> None:
+        """ The search in course, if any, stops and moves the best action found so far
+        """
+        if self.pending is not None:
+            self.stop_id.value = self.pending
+
+    def cancel(self) -> None:
+        """ The search in course, if any, stops and its action is dropped
+        """
+        if self.pending is not None:
+            self.stop_now()
+            self.cancelled.add(self.pending)
+            self.pending = None
+
+    def close(self) -> None:
+        """ Cancels any search and waits for the AI process to exit
+        """
+        self.cancel()
+        self.requests.put(('quit',))
+        self.process.join()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import queue
+import random
+
+import config as cfg
+import core
+
+from . import apply_settings, settings
+from .tt import SharedTranspositionTable
+
+__doc__ = """ Lazy SMP: parallel search in several processes.
+
+Every helper process searches the same position with iterative deepening,
+at the same time as the main one, with its move ordering slightly varied
+so they don't all follow the same path. They don't communicate at all but
+through a transposition table in shared memory: what each one finds makes
+the others (and the main search, the only one whose result is used) faster.
+Processes are used instead of threads, as searching holds the GIL.
+"""
+
+
+def helper(num: int, rows: int, cols: int, values: dict, tt_name: str, jobs, results, stop) -> None:
+    """ Helper process main loop, with the given settings (see ai.settings).
+    Jobs are (game state, maximum depth, TT generation) tuples, or None to
+    exit. After each one, its number of nodes is sent back.
+    """
+    from engine.game import Game
+    from .ai import AI
+
+    apply_settings(values)
+    cfg.AI_DISTRIBUTED = False
+    core.init()
+    game = Game(rows, cols)
+    tt = SharedTranspositionTable(cfg.TT_SIZE, tt_name)
+    rand = random.Random(num)
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+
+        state, depth, generation = job
+        game.state = state
+        ai = game.current_player.AI
+        if ai is None:
+            ai = AI(game.current_player, depth, tt=tt, threads=1)
+            ai.movetime = ai.max_nodes = None  # Searches until stopped
+            ai.stop_event = stop
+
+        # Odd helpers search one ply deeper, and every one sorts the moves with
+        # its own history noise (see AI.ordered)
+        tt.generation = generation
+        ai.killers.clear()
+        ai.history = [rand.randrange(cfg.AI_SMP_HISTORY_NOISE) for _ in ai.history]
+        ai.pv = []
+        nodes = ai.nodes
+        ai.iterate(min(depth + (num & 1), cfg.AI_MAX_DEPTH))
+        results.put(ai.nodes - nodes)
+
+    tt.close()
+
+
+class LazySMP:
+    """ Pool of helper processes searching along with the given AI (see
+    helper), which is switched to a shared transposition table.
+    """
+    def __init__(self, ai, num_helpers: int):
+        self.ai = ai
+        game = ai.game
+        ctx = multiprocessing.get_context()
+        ai.tt = self.tt = SharedTranspositionTable(cfg.TT_SIZE)
+        self.stop = ctx.Event()
+        self.results = ctx.Queue()
+        self.jobs = [ctx.Queue() for _ in range(num_helpers)]
+        self.processes = [ctx.Process(target=helper, daemon=True,
+                                      args=(i + 1, game.rows, game.cols, settings(), self.tt.name,
+                                            self.jobs[i], self.results, self.stop))
+                          for i in range(num_helpers)]
+        self.nodes = 0  # Searched by the helpers
+
+        for process in self.processes:
+            process.start()
+
+    def start(self, depth: int) -> None:
+        """ Helpers start searching the current position of the AI game,
+        up to the given depth at most
+        """
+        job = self.ai.game.state, depth, self.tt.generation
+        for jobs in self.jobs:
+            jobs.put(job)
+
+    def finish(self) -> int:
+        """ Stops the helpers search, and waits for them. Returns the
+        nodes they searched. Raises RuntimeError if any helper exited.
+        """
+        self.stop.set()
+        nodes = 0
+        for _ in self.processes:
+            while True:
+                try:
+                    nodes += self.results.get(timeout=1)
+                    break
+                except queue.Empty:
+                    if not all(process.is_alive() for process in self.processes):
+                        raise RuntimeError('Lazy SMP helper process exited')
+
+        self.stop.clear()
+        self.nodes += nodes
+        return nodes
+
+    def close(self) -> None:
+        for jobs in self.jobs:
+            jobs.put(None)
+
+        for process in self.processes:
+            process.join()
+
+        self.tt.close(unlink=True)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+import pickle
+from array import array
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+__doc__ = """ Fixed size transposition table.
+
+Entries live in preallocated arrays grouped in buckets of two slots: the first
+one keeps the deepest search of the current generation (depth-preferred), the
+second one is always replaced. Aging is done with a generation counter,
+increased before each search, so old entries become replaceable with no
+cleanup sweep.
+
+Each slot is a pair of 64 bit words: the packed data, and the position key
+xor'ed with it. A slot written by two searches at the same time (see
+SharedTranspositionTable) then just doesn't match any key, so it needs no lock.
+"""
+
+# Bound type of the stored value
+EXACT = 0
+LOWER = 1  # Real value >= stored one (fail high)
+UPPER = 2  # Real value <= stored one (fail low)
+
+VALUE_OFFSET = 1 << 15  # Values are stored unsigned in 16 bits
+GENERATIONS = 1 << 8
+
+
+class TranspositionTable:
+    """ Maps position keys (see engine.zobrist) to search results:
+    (depth, value, bound, move). Moves are action codes (see Game.encode_action).
+    """
+    def __init__(self, size: int):
+        self.num_buckets = max(1, size >> 1)
+        assert self.num_buckets & (self.num_buckets - 1) == 0, "Size must be a power of 2"
+        self.mask = self.num_buckets - 1
+        self.generation = 0
+
+        # Data is packed as value | depth << 16 | bound << 24 | generation << 26 | (move + 1) << 34
+        self.keys, self.data = self.allocate(2 * self.num_buckets)
+
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self) -> None:
+        """ Must be called before each search. Entries from older
+        searches will be overwritten first.
+        """
+        self.generation = (self.generation + 1) % GENERATIONS
+
+    def probe(self, key: int) -> Optional[Tuple[int, int, int, Optional[int]]]:
+        """ Returns the entry (depth, value, bound, move) for the given key, if any
+        """
+        self.probes += 1
+        i = (key & self.mask) << 1
+        keys = self.keys
+        data = self.data[i]
+        if keys[i] ^ data != key:
+            i += 1
+            data = self.data[i]
+            if keys[i] ^ data != key:
+                return None
+
+        self.hits += 1
+        move = (data >> 34) - 1
+        return (data >> 16) & 0xFF, (data & 0xFFFF) - VALUE_OFFSET, (data >> 24) & 3, (move if move >= 0 else None)
+
+    def store(self, key: int, depth: int, value: int, bound: int, move: Optional[int]) -> None:
+        """ Stores a search result. It goes to the depth-preferred slot of the bucket
+        if it's as deep as the entry there or that entry is from an older search,
+        and to the always-replace slot otherwise.
+        """
+        self.stores += 1
+        i = (key & self.mask) << 1
+        data = self.data[i]
+        if self.keys[i] ^ data != key and (data >> 16) & 0xFF > depth and (data >> 26) & 0xFF == self.generation:
+            i += 1
+
+        data = ((value + VALUE_OFFSET) | depth << 16 | bound << 24 | self.generation << 26 |
+                (move + 1 if move is not None else 0) << 34)
+        self.data[i] = data
+        self.keys[i] = key ^ data
+
+    @staticmethod
+    def allocate(n: int) -> Tuple[array, array]:
+        """ Returns the keys and data arrays of n slots
+        """
+        return array('Q', bytes(8 * n)), array('Q', bytes(8 * n))
+
+    def clear(self) -> None:
+        zeros = array('Q', bytes(8 * len(self.keys)))
+        self.keys[:] = zeros
+        self.data[:] = zeros
+
+    def save(self, fname: str) -> None:
+        with open(fname, 'wb') as f:
+            pickle.dump((array('Q', self.keys), array('Q', self.data), self.generation), f)
+
+    def load(self, fname: str) -> None:
+        """ Loads a table saved with save(). Must have the same size.
+        """
+        with open(fname, 'rb') as f:
+            keys, data, generation = pickle.load(f)
+
+        if len(keys) != len(self.keys):
+            raise ValueError('Transposition table size mismatch')
+
+        self.keys[:] = keys
+        self.data[:] = data
+        self.generation = generation
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """ Transposition table held in shared memory, so several search
+    processes (see ai.smp) use the same one. Slots are written with no lock.
+    If no name is given, a new block is created. Otherwise the
+    existing one with that name (and size) is attached.
+    """
+    def __init__(self, size: int, name: Optional[str] = None):
+        self.name = name
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        super().__init__(size)
+
+    def allocate(self, n: int) -> Tuple[memoryview, memoryview]:
+        if self.name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=16 * n)
+            self.shm.buf[:] = bytes(16 * n)
+            self.name = self.shm.name
+        else:
+            self.shm = shared_memory.SharedMemory(name=self.name)
+
+        buf = self.shm.buf
+        return buf[:8 * n].cast('Q'), buf[8 * n:16 * n].cast('Q')
+
+    def close(self, unlink: bool = False) -> None:
+        """ Detaches the shared memory block, and frees it if unlink is set
+        (only the process which created it should)
+        """
+        if self.shm is None:
+            return
+
+        self.keys.release()
+        self.data.release()
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+        self.shm = None
@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 
 import os
-from pygame import Color
 
 from entities.coord import Coord
 
@@ -31,34 +30,35 @@ DEF_COLS = 9
 NUM_WALLS = 10
 
 ### COLORS ###
+# Plain RGB t-uples, so this module can be imported without pygame
 # Font Color & SIZE
-FONT_COLOR = Color(0, 10, 50)
-FONT_BG_COLOR = Color(255, 255, 255)
+FONT_COLOR = (0, 10, 50)
+FONT_BG_COLOR = (255, 255, 255)
 FONT_SIZE = 16
 
 # Board Background and Border color and look
-BOARD_BG_COLOR = Color(240, 255, 255)
-BOARD_BRD_COLOR = Color(0, 0, 40)
+BOARD_BG_COLOR = (240, 255, 255)
+BOARD_BRD_COLOR = (0, 0, 40)
 BOARD_BRD_SIZE = 1
 
 # Cell colors
-CELL_BORDER_COLOR = Color(40, 40, 40)
-CELL_COLOR = Color(120, 90, 60)
-CELL_VALID_COLOR = Color(40, 120, 120)  # Cyan
+CELL_BORDER_COLOR = (40, 40, 40)
+CELL_COLOR = (120, 90, 60)
+CELL_VALID_COLOR = (40, 120, 120)  # Cyan
 
 # Wall Color
-WALL_COLOR = Color(10, 10, 10)
+WALL_COLOR = (10, 10, 10)
 
 # Pawns color
-PAWN_A_COL = Color(158, 60, 60)  # Red
-PAWN_B_COL = Color(60, 60, 158)  # Blue
-PAWN_BORDER_COL = Color(188, 188, 80)  # Yellow
+PAWN_A_COL = (158, 60, 60)  # Red
+PAWN_B_COL = (60, 60, 158)  # Blue
+PAWN_BORDER_COL = (188, 188, 80)  # Yellow
 
 # Gauge bars
 GAUGE_WIDTH = CELL_WIDTH
 GAUGE_HEIGHT = 5
-GAUGE_COLOR = Color(128, 40, 40)
-GAUGE_BORDER_COLOR = Color(0, 0, 0)
+GAUGE_COLOR = (128, 40, 40)
+GAUGE_BORDER_COLOR = (0, 0, 0)
 
 # Other constants
 PAWN_PADDING = 25  # Pixels right to the board
@@ -89,6 +89,71 @@ SERVER_URL = 'http://{}:{}'.format(SERVER_ADDR, PORT)
 # Default AI playing level
 LEVEL = 0
 
+# AI search budget per move, in seconds and nodes. If any is set, the AI searches
+# deeper and deeper (iterative deepening) until it runs out, regardless of LEVEL
+MOVETIME = None
+NODES = None
+AI_MAX_DEPTH = 32
+AI_ASPIRATION_WINDOW = 2  # Half width of the window around the previous value (0 to disable)
+
+# AI parallel search (see ai.smp): number of processes searching each move,
+# and the noise added to the history scores of the helper ones
+AI_THREADS = 1
+AI_SMP_HISTORY_NOISE = 64
+
+# AI distributed search (see ai.distributed). The coordinator listens for workers at the
+# given address (port 0 = any free one), and starts AI_DIST_WORKERS of them on this machine.
+# Iterations shallower than AI_DIST_MIN_DEPTH are searched locally
+AI_DISTRIBUTED = False
+AI_DIST_HOST = 'localhost'
+AI_DIST_PORT = 0
+AI_DIST_WORKERS = 0
+AI_DIST_MIN_DEPTH = 2
+AI_DIST_POLL = 0.01  # Seconds an idle worker waits before asking for work again
+
+# AI pondering: keep searching, while the opponent thinks, its expected reply
+AI_PONDER = False
+
+# AI engine: 'minimax' (see ai.ai) or 'mcts' (Monte Carlo Tree Search, see ai.mcts)
+AI_ENGINE = 'minimax'
+
+# MCTS: playouts per move (shifted left by the level), exploration constant, progressive
+# widening (children allowed = AI_MCTS_WIDEN_BASE + AI_MCTS_WIDEN * sqrt(visits)) and tree size cap
+AI_MCTS_PLAYOUTS = 250
+AI_MCTS_EXPLORATION = 0.7
+AI_MCTS_WIDEN_BASE = 2
+AI_MCTS_WIDEN = 1.0
+AI_MCTS_MAX_NODES = 1 << 18
+AI_MCTS_PROGRESS = 64  # Playouts between progress updates
+AI_MCTS_SEED = None  # Random seed of the rollouts
+
+# MCTS rollouts: per expanded node, plies played, chance of putting a wall cutting the
+# opponent shortest path each ply (trying at most AI_MCTS_ROLLOUT_TRIES ones), and scoring
+# of the position reached: logistic of the path length lead (plus walls left) by this scale
+AI_MCTS_ROLLOUTS = 4
+AI_MCTS_ROLLOUT_PLIES = 8
+AI_MCTS_ROLLOUT_WALLS = 0.3
+AI_MCTS_ROLLOUT_TRIES = 4
+AI_MCTS_WALL_VALUE = 0.5
+AI_MCTS_SCALE = 2.0
+
+# AI null move pruning: try passing the turn first, with a search reduced by this depth,
+# at non PV nodes at least AI_NULL_MOVE_DEPTH plies deep. Cutoffs are verified, in case
+# of zugzwang, with a reduced search, unless AI_NULL_MOVE_VERIFY is False. Off by default,
+# as it changes what each level plays
+AI_NULL_MOVE = False
+AI_NULL_MOVE_REDUCTION = 2
+AI_NULL_MOVE_DEPTH = 3
+AI_NULL_MOVE_VERIFY = True
+
+# AI late move reductions: moves after the first AI_LMR_MOVES ones (but killers and the
+# best one) are searched first with the depth reduced, at nodes at least AI_LMR_DEPTH deep.
+# Off by default, as it changes what each level plays
+AI_LMR = False
+AI_LMR_REDUCTION = 1
+AI_LMR_MOVES = 4
+AI_LMR_DEPTH = 3
+
 # Infinite
 INF = 99
 
@@ -96,4 +161,27 @@ INF = 99
 CACHE_ENABLED = False
 CACHE_DIR = './__cache'
 CACHE_AI_FNAME = os.path.join(CACHE_DIR, 'ai.memo')
-CACHE_DIST_FNAME = os.path.join(CACHE_DIR, 'dist.memo')
+
+# Transposition table entries (power of 2)
+TT_SIZE = 1 << 20
+
+# Distance fields kept in the (LRU) cache
+DIST_CACHE_SIZE = 1 << 15
+
+# Positions (walls and pawns) whose put-wall legality is kept in the (LRU) cache
+WALL_CACHE_SIZE = 1 << 14
+
+# Evaluate the walls at the search leaves in a single batch (needs NumPy, which is optional)
+AI_BATCH_LEAVES = True
+AI_BATCH_SIZE = 128  # Walls per batch. Smaller ones make cutoffs skip more work
+AI_BATCH_MIN = 32  # Fewer walls to evaluate are done one by one
+
+# AI wall candidates pruning: only walls within this distance (in cells) of the pawns,
+# their shortest paths or the walls on board are searched. None to search them all. Off by
+# default, as it changes what each level plays
+AI_ZONE_RADIUS = None
+AI_EXHAUSTIVE_ROOT = True  # Search every wall at the root anyway
+
+# AI move ordering: try first pawn moves approaching the goal and walls cutting
+# the opponent shortest paths (after the TT best move, killer moves and history)
+AI_ORDER_STATIC = True
@@ -1,18 +1,51 @@
 # -*- coding: utf-8 -*-
 
-import re
-from typing import List, Dict, Set, Any
-import pygame
+import heapq
+from collections import OrderedDict
+from typing import List, Any, Tuple, Union
 
 import config as cfg
 from entities.coord import Coord
+from engine.bitboard import distance_fields
+from config import DIRS
+
+class LRUCache:
+    """ Least recently used cache of up to size values, keyed by tuples
+    of ints. Values not found are None.
+    """
+    def __init__(self, size: int):
+        self.size = size
+        self.items: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[int, ...]) -> Any:
+        try:
+            value = self.items[key]
+        except KeyError:
+            self.misses += 1
+            return None
+
+        self.items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Tuple[int, ...], value: Any) -> None:
+        self.items[key] = value
+        self.items.move_to_end(key)
+        if len(self.items) > self.size:
+            self.items.popitem(last=False)
+
+    def __len__(self):
+        return len(self.items)
 
-# Core (shared) data. Must be initialized invoking init()
-# This global counter counts the total number of players instantiated (Pawns)
-PAWNS = None
 
-# Memoized put-wall cache
-MEMOIZED_WALLS: Dict[str, Any] = {}
+# Core (shared) data, for every pawn and AI instance. Must be initialized invoking init()
+# Memoized put-wall legality: (walls key, pawn bits...) -> [checked walls mask, legal walls mask]
+MEMOIZED_WALLS = LRUCache(cfg.WALL_CACHE_SIZE)
+
+# Memoized distance fields: (walls key, goal mask) -> field
+DISTANCES = LRUCache(cfg.DIST_CACHE_SIZE)
 
 # --- Statistics ---
 MEMOIZED_NODES = None  # Memoized AI Nodes
@@ -44,114 +77,246 @@ class CellArray:
 
 class DistArray(CellArray):
     """ An array which calculates minimum distances
-    for each get_cell.
+    for each get_cell. Distances are stored flat
+    (row * cols + col), as computed by engine.bitboard.
+    They only depend on the walls and the goal side, so they
+    are memoized in the shared DISTANCES cache.
+
+    The array is either a memoized field (immutable bytes) or
+    the bytearray buffer of the current depth, taken from a pool.
+    Fields are copied into the buffer before being modified
+    (copy on write), and the memo gets an immutable copy.
+    push_state / pop_state only move references, so once the pool
+    has grown to the search depth nothing is allocated.
     """
     def __init__(self, pawn):
         self.pawn = pawn
-        super().__init__(pawn.board, cfg.INF)
-
-        self.queue: Set[Coord] = set()
-        self.MEMOIZE_DISTANCES = {}
-        self.MEMO_HITS = 0
-        self.MEMO_COUNT = 0
-        self.stack = []
+        self.board = pawn.game
+        self.rows = self.board.rows
+        self.cols = self.board.cols
+        self.size = self.rows * self.cols
+        self.array: Union[bytes, bytearray] = self.board.layout.inf_field
+        self.goal_mask = pawn.goal_mask
+
+        self.key = None  # Walls key the array holds the distances of
+        self.REPAIRED_CELLS = 0
+        self.depth = 0  # Number of saved states
+        self.saved_arrays: List[Union[bytes, bytearray]] = []
+        self.saved_keys: List[int] = []
+        self.pool: List[bytearray] = []  # Buffer of each depth
         self.update()
 
-    def clean_memo(self):
-        """ Frees memory by removing unused states.
-        """
-        l_ = 1 + len(self.board.pawns) * 4
-        k = self.board.state[l_:]
-        k = '.' * l_ + k.replace('1', '.') + '$'
-        r = re.compile(k)
+    def __getitem__(self, i: int) -> bytes:
+        return self.array[i * self.cols:(i + 1) * self.cols]
 
-        for q in list(self.MEMOIZE_DISTANCES.keys()):
-            if not r.match(q):
-                del self.MEMOIZE_DISTANCES[q]
+    def get_cell(self, coord: Coord) -> int:
+        return self.array[coord.row * self.cols + coord.col]
 
-    def update(self):
-        """ Computes minimum distances from the current
-        position to the goal.
+    def set_cell(self, coord: Coord, value: int) -> None:
+        self.writable()[coord.row * self.cols + coord.col] = value
+        self.key = None
+
+    @property
+    def buffer(self) -> bytearray:
+        """ Working buffer of the current depth
         """
-        k = self.board.state
-        try:
-            self.array = self.MEMOIZE_DISTANCES[k]
-            self.MEMO_HITS += 1
-            return
-        except KeyError:
-            self.MEMO_COUNT += 1
+        while len(self.pool) <= self.depth:
+            self.pool.append(bytearray(self.size))
 
-        for i in range(self.rows):
-            for j in range(self.cols):
-                self.array[i][j] = cfg.INF
+        return self.pool[self.depth]
 
-        for goal in self.pawn.goals:
-            self.set_cell(goal, 0)  # Already in the goal
-            self.queue.add(goal)
+    def writable(self) -> bytearray:
+        """ Returns the array, once copied to the buffer of the
+        current depth (unless it's already there)
+        """
+        buffer = self.buffer
+        if self.array is not buffer:
+            buffer[:] = self.array
+            self.array = buffer
 
-        self.update_distances()
-        self.MEMOIZE_DISTANCES[k] = self.array
+        return buffer
 
-    def update_cell(self, coord: Coord):
-        """ Updates the get_cell if not locked yet.
+    def lookup(self) -> bool:
+        """ Loads the distances of the current position from the memo.
+        Returns False if they must be computed (see store()).
         """
-        if coord in self.pawn.goals:
-            return
-
-        values = [self.get_cell(pos) for pos in self.pawn.valid_moves_from(coord)]
-        newval = 1 + min(values)
+        k = self.board.wall_key
+        if k == self.key:
+            return True  # Already up to date
 
-        if newval < self.get_cell(coord):
-            self.set_cell(coord, newval)
-            self.queue.add(coord)
+        array = DISTANCES.get((k, self.goal_mask))
+        if array is None:
+            return False
 
-    def update_distances(self):
-        cell = self.pawn.cell
-        self.pawn.cell = None
+        self.array = array
+        self.key = k
+        return True
 
-        while self.queue:
-            coord = self.queue.pop()
-            for pos in self.pawn.valid_moves_from(coord):
-                self.update_cell(pos)
+    def store(self, array: bytearray):
+        """ Sets (and memoizes) the distances of the current position,
+        already written to the buffer.
+        """
+        self.array = array
+        self.key = self.board.wall_key
+        DISTANCES.put((self.key, self.goal_mask), bytes(array))
+
+    def add_wall(self, index: int) -> None:
+        """ Repairs the distances once the given wall (index, see
+        engine.bitboard.wall_index) has been put on the board.
+        A wall only cuts two edges, so only the cells whose shortest paths
+        crossed them are relaxed again. The result is memoized, so it is done
+        on a copy: memoized fields are never modified. Reverted with undo_wall().
+        """
+        self.push_state()
+        if self.lookup():
+            return
 
-        self.pawn.cell = cell
+        array = self.writable()
+        lay = self.board.layout
+        blocked = self.board.blocked
+        steps = lay.steps
+        slot = index >> 1
+        cuts = lay.h_cuts[slot] if index & 1 else lay.v_cuts[slot]
+
+        # Cells which lost their shortest path, in increasing distance order
+        heap = []
+        for u, v in cuts:
+            if array[u] == array[v] + 1:
+                heap.append((array[u], u))
+            elif array[v] == array[u] + 1:
+                heap.append((array[v], v))
+
+        heapq.heapify(heap)
+        invalid = set()
+        while heap:
+            dist, sq = heapq.heappop(heap)
+            if not dist or dist >= cfg.INF or sq in invalid:
+                continue
+
+            neighbours = [sq + steps[d] for d in DIRS if not (blocked[d] >> sq) & 1]
+            if any(array[n] == dist - 1 and n not in invalid for n in neighbours):
+                continue  # Still has a shortest path
+
+            invalid.add(sq)
+            for n in neighbours:
+                if array[n] == dist + 1:
+                    heapq.heappush(heap, (dist + 1, n))
+
+        # Relax them again from the cells around
+        for sq in invalid:
+            array[sq] = cfg.INF
+
+        for sq in invalid:
+            dist = 1 + min((array[sq + steps[d]] for d in DIRS if not (blocked[d] >> sq) & 1), default=cfg.INF)
+            if dist < cfg.INF:
+                array[sq] = dist
+                heap.append((dist, sq))
+
+        heapq.heapify(heap)
+        while heap:
+            dist, sq = heapq.heappop(heap)
+            if dist > array[sq]:
+                continue
+
+            for d in DIRS:
+                if not (blocked[d] >> sq) & 1:
+                    n = sq + steps[d]
+                    if n in invalid and array[n] > dist + 1:
+                        array[n] = dist + 1
+                        heapq.heappush(heap, (dist + 1, n))
+
+        self.REPAIRED_CELLS += len(invalid)
+        self.store(array)
+
+    def undo_wall(self) -> None:
+        """ Restores the distances there were before the last add_wall()
+        """
+        self.pop_state()
 
-    def draw(self):
-        """ Displays distance numbers in the screen
+    def update(self):
+        """ Computes minimum distances from the current
+        position to the goal.
         """
-        for i in range(self.rows):
-            for j in range(self.cols):
-                r = self.board[i][j].rect
-                r.x = r.x + r.width - cfg.FONT_SIZE
-                r.y = r.y + r.height - cfg.FONT_SIZE
-                r.width = cfg.FONT_SIZE
-                r.height = cfg.FONT_SIZE
-                pygame.draw.rect(self.pawn.screen, cfg.FONT_BG_COLOR, r, 0)  # Erases previous number
-                self.board.msg(r.x, r.y, str(self.array[i][j]))
+        if not self.lookup():
+            buffer = self.buffer
+            distance_fields(self.board.layout, self.board.blocked, [self.goal_mask], [buffer])
+            self.store(buffer)
 
     def push_state(self):
-        self.stack.append(self.array)
-        super().__init__(self.pawn.board, cfg.INF)
+        depth = self.depth
+        if depth == len(self.saved_arrays):
+            self.saved_arrays.append(None)
+            self.saved_keys.append(None)
+
+        self.saved_arrays[depth] = self.array
+        self.saved_keys[depth] = self.key
+        self.depth = depth + 1
 
     def pop_state(self):
-        self.array = self.stack.pop()
+        self.depth -= 1
+        self.array = self.saved_arrays[self.depth]
+        self.key = self.saved_keys[self.depth]
+
+    def shortest_paths(self) -> Tuple[int, int]:
+        """ Returns the mask of squares on the shortest paths from the pawn
+        (starting at its best moves), and the mask of walls (see
+        engine.bitboard.wall_index) cutting any of their edges (those going one
+        step closer to the goal). Putting any other wall can't change
+        shortest_path_len, unless it also changes the pawn moves.
+        """
+        array = self.array
+        lay = self.board.layout
+        blocked = self.board.blocked
+        moves = self.pawn.move_squares
+        if not moves:
+            return 0, 0
+
+        best = min([array[sq] for sq in moves])
+        todo = [sq for sq in moves if array[sq] == best]
+        squares = 0
+        for sq in todo:
+            squares |= 1 << sq
+        walls = 0
+
+        while todo:
+            sq = todo.pop()
+            dist = array[sq]
+            if not dist or dist >= cfg.INF:
+                continue
+
+            for d in DIRS:
+                if not (blocked[d] >> sq) & 1:
+                    n = lay.neighbours[d][sq]
+                    if array[n] == dist - 1:
+                        walls |= lay.edge_walls[d][sq]
+                        if not (squares >> n) & 1:
+                            squares |= 1 << n
+                            todo.append(n)
+
+        return squares, walls
+
+    def shortest_path_walls(self) -> int:
+        """ Mask of walls cutting any shortest path (see shortest_paths)
+        """
+        return self.shortest_paths()[1]
 
     @property
     def shortest_path_len(self):
         """ Return len of the shortest path
         """
-        return min([self.get_cell(pos) for pos in self.pawn.valid_moves])
+        array = self.array
+        return min([array[sq] for sq in self.pawn.move_squares])
 
 
 def init():
-    global PAWNS
     global MEMOIZED_WALLS
+    global DISTANCES
     global MEMOIZED_NODES
     global MEMOIZED_NODES_HITS
     global BOARD
 
-    PAWNS = 0
-    MEMOIZED_WALLS = {}
+    MEMOIZED_WALLS = LRUCache(cfg.WALL_CACHE_SIZE)
+    DISTANCES = LRUCache(cfg.DIST_CACHE_SIZE)
     MEMOIZED_NODES = 0
     MEMOIZED_NODES_HITS = 0
     BOARD = None
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+
+from functools import lru_cache
+from typing import List, Tuple
+
+from entities.coord import Coord
+from config import DIR, INF, OPPOSITE_DIRS
+
+__doc__ = """ Bit masks used by the game state.
+
+Square (row, col) is bit row * cols + col of a square mask.
+Wall slot (row, col) is bit row * (cols - 1) + col of a wall mask. A wall at
+slot (i, j) lays between rows i, i + 1 (horizontal) or cols j, j + 1 (vertical)
+and is two cells long.
+Masks with walls of both orientations use bit slot << 1 | horiz (wall_index()),
+so they enumerate walls in slot order, vertical first.
+"""
+
+
+def bit(n: int) -> int:
+    return 1 << n
+
+
+def wall_index(slot: int, horiz: bool) -> int:
+    """ Bit index of a wall in masks holding both orientations
+    """
+    return slot << 1 | horiz
+
+
+class Layout:
+    """ Precomputed masks for a board of the given size.
+    Use layout() to get a shared instance.
+    """
+    def __init__(self, rows: int, cols: int):
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+        self.full = bit(self.size) - 1
+        self.inf_field = bytes([INF]) * self.size  # Distances when nothing is reachable
+        self.coords: List[Coord] = [Coord(*divmod(sq, cols)) for sq in range(self.size)]  # Coord of each square
+        self.slot_cols = cols - 1
+        self.num_slots = (rows - 1) * (cols - 1)
+
+        self.row_masks: List[int] = [(bit(cols) - 1) << (i * cols) for i in range(rows)]
+        self.col_masks: List[int] = [sum(bit(i * cols + j) for i in range(rows)) for j in range(cols)]
+
+        # Edges blocked by the board border, indexed by direction
+        self.border: List[int] = [0] * 4
+        self.border[DIR.N] = self.row_masks[0]
+        self.border[DIR.S] = self.row_masks[-1]
+        self.border[DIR.E] = self.col_masks[0]
+        self.border[DIR.W] = self.col_masks[-1]
+
+        # Square index delta of one step in each direction
+        self.steps: List[int] = [0] * 4
+        self.steps[DIR.N] = -cols
+        self.steps[DIR.S] = cols
+        self.steps[DIR.E] = -1
+        self.steps[DIR.W] = 1
+
+        # Neighbour square of each square in each direction (-1 if off board)
+        self.neighbours: List[List[int]] = [
+            [sq + self.steps[d] if not (self.border[d] >> sq) & 1 else -1 for sq in range(self.size)]
+            for d in range(4)
+        ]
+        # Jumps over a pawn at each square when entering it from the given direction:
+        # (direction, landing square) of every way out of it but going back
+        self.jumps: List[List[Tuple[Tuple[int, int], ...]]] = [
+            [tuple((d2, self.neighbours[d2][sq]) for d2 in range(4)
+                   if d2 != OPPOSITE_DIRS[d] and self.neighbours[d2][sq] >= 0)
+             for sq in range(self.size)]
+            for d in range(4)
+        ]
+
+        # Edges (S for horizontal, W for vertical walls) cut by each wall slot
+        self.h_edges: List[int] = []
+        self.v_edges: List[int] = []
+        # Same, as pairs of squares
+        self.h_cuts: List[Tuple[Tuple[int, int], ...]] = []
+        self.v_cuts: List[Tuple[Tuple[int, int], ...]] = []
+        # Wall indexes (see wall_index) which can't hold a wall if the given one
+        # has it: same slot, overlapping or crossing
+        self.all_walls = bit(2 * self.num_slots) - 1
+        self.wall_conflicts: List[int] = [0] * (2 * self.num_slots)
+
+        for slot in range(self.num_slots):
+            i, j = divmod(slot, self.slot_cols)
+            sq = i * cols + j
+            self.h_edges.append(bit(sq) | bit(sq + 1))
+            self.v_edges.append(bit(sq) | bit(sq + cols))
+            self.h_cuts.append(((sq, sq + cols), (sq + 1, sq + 1 + cols)))
+            self.v_cuts.append(((sq, sq + 1), (sq + cols, sq + cols + 1)))
+
+            h = bit(wall_index(slot, True)) | bit(wall_index(slot, False))
+            if j > 0:
+                h |= bit(wall_index(slot - 1, True))
+            if j < self.slot_cols - 1:
+                h |= bit(wall_index(slot + 1, True))
+            self.wall_conflicts[wall_index(slot, True)] = h
+
+            v = bit(wall_index(slot, False)) | bit(wall_index(slot, True))
+            if i > 0:
+                v |= bit(wall_index(slot - self.slot_cols, False))
+            if i < rows - 2:
+                v |= bit(wall_index(slot + self.slot_cols, False))
+            self.wall_conflicts[wall_index(slot, False)] = v
+
+        # Walls (see wall_index) touching each square or its neighbours
+        self.near_walls: List[int] = [0] * self.size
+        for sq in range(self.size):
+            r, c = divmod(sq, cols)
+            for i in range(max(r - 2, 0), min(r + 2, rows - 1)):
+                for j in range(max(c - 2, 0), min(c + 2, cols - 1)):
+                    slot = i * self.slot_cols + j
+                    self.near_walls[sq] |= bit(wall_index(slot, False)) | bit(wall_index(slot, True))
+
+        # Walls (see wall_index) blocking the edge of each square in each direction
+        self.edge_walls: List[List[int]] = [[0] * self.size for _ in range(4)]
+        for slot in range(self.num_slots):
+            h, v = bit(wall_index(slot, True)), bit(wall_index(slot, False))
+            for sq in range(self.size):
+                if (self.h_edges[slot] >> sq) & 1:
+                    self.edge_walls[DIR.S][sq] |= h
+                    self.edge_walls[DIR.N][sq + cols] |= h
+                if (self.v_edges[slot] >> sq) & 1:
+                    self.edge_walls[DIR.W][sq] |= v
+                    self.edge_walls[DIR.E][sq + 1] |= v
+
+        # Walls blocking any edge of each square
+        self.touching_walls: List[int] = [
+            self.edge_walls[0][sq] | self.edge_walls[1][sq] | self.edge_walls[2][sq] | self.edge_walls[3][sq]
+            for sq in range(self.size)
+        ]
+
+        # Walls sharing any point (other than the border) with each wall
+        # (see engine.wallgraph for wall points)
+        self.adjacent_walls: List[int] = [0] * (2 * self.num_slots)
+
+        # Wall mask of both orientations at the slots of each byte of a slot mask
+        self.spread_slots: List[int] = [sum(3 << (2 * k) for k in range(8) if (b >> k) & 1) for b in range(256)]
+
+        # Wall graph (see engine.wallgraph): lattice points at the corners of the
+        # cells, numbered row * (cols + 1) + col. Every point on the border is
+        # the same node (0), as the border is one connected "wall".
+        self.num_points = (rows + 1) * (cols + 1)
+        self.wall_points: List[Tuple[int, int, int]] = [()] * (2 * self.num_slots)
+
+        def point(r: int, c: int) -> int:
+            if r in (0, rows) or c in (0, cols):
+                return 0
+            return r * (cols + 1) + c
+
+        for slot in range(self.num_slots):
+            i, j = divmod(slot, self.slot_cols)
+            self.wall_points[wall_index(slot, True)] = point(i + 1, j), point(i + 1, j + 1), point(i + 1, j + 2)
+            self.wall_points[wall_index(slot, False)] = point(i, j + 1), point(i + 1, j + 1), point(i + 2, j + 1)
+
+        walls_at: dict = {}  # Walls through each point
+        for index, points in enumerate(self.wall_points):
+            for p in points:
+                if p:
+                    walls_at[p] = walls_at.get(p, 0) | bit(index)
+
+        for index, points in enumerate(self.wall_points):
+            for p in points:
+                if p:
+                    self.adjacent_walls[index] |= walls_at[p] & ~bit(index)
+
+    def dilate(self, squares: int, radius: int) -> int:
+        """ Adds to the square mask every square within the given
+        (manhattan) distance, ignoring walls
+        """
+        cols = self.cols
+        border = self.border
+        for _ in range(radius):
+            squares |= (((squares & ~border[DIR.N]) >> cols) | ((squares & ~border[DIR.S]) << cols) |
+                        ((squares & ~border[DIR.E]) >> 1) | ((squares & ~border[DIR.W]) << 1))
+
+        return squares
+
+    def walls_around(self, squares: int) -> int:
+        """ Mask of walls (see wall_index) blocking any edge of the given
+        squares. Both orientations of a slot touch the same four cells
+        """
+        cols = self.cols
+        row_mask = bit(cols) - 1
+        slot_mask = bit(self.slot_cols) - 1
+        slots = 0
+        for i in range(self.rows - 1):
+            cells = ((squares >> (i * cols)) | (squares >> ((i + 1) * cols))) & row_mask
+            slots |= ((cells | cells >> 1) & slot_mask) << (i * self.slot_cols)
+
+        result = 0
+        shift = 0
+        while slots:
+            result |= self.spread_slots[slots & 0xFF] << shift
+            slots >>= 8
+            shift += 16
+
+        return result
+
+    def square(self, coord: Coord) -> int:
+        """ Bit index of the given cell coord
+        """
+        return coord.row * self.cols + coord.col
+
+    def slot(self, coord: Coord) -> int:
+        """ Bit index of the wall slot at the given coord
+        """
+        return coord.row * self.slot_cols + coord.col
+
+    def slot_coord(self, slot: int) -> Coord:
+        return Coord(*divmod(slot, self.slot_cols))
+
+
+@lru_cache(maxsize=None)
+def layout(rows: int, cols: int) -> Layout:
+    """ Returns the (shared) Layout for the given board size
+    """
+    return Layout(rows, cols)
+
+
+def distance_fields(lay: Layout, blocked: List[int], sources: List[int],
+                    fields: List[bytearray] = None) -> List[bytearray]:
+    """ Bit-parallel breadth first search on the board. Each BFS layer
+    expands the whole frontier at once with shifts and masks. Returns, for
+    each source mask (i.e. a goal row), a flat array of the minimum number of
+    steps from every cell to it (INF if unreachable). Pawns are ignored.
+    All the sources are expanded in the same loop.
+    Arrays are written into the given fields buffers, if any.
+    """
+    cols = lay.cols
+    open_n = lay.full & ~blocked[DIR.N]
+    open_s = lay.full & ~blocked[DIR.S]
+    open_e = lay.full & ~blocked[DIR.E]
+    open_w = lay.full & ~blocked[DIR.W]
+
+    if fields is None:
+        fields = [bytearray(lay.size) for _ in sources]
+
+    for field in fields:
+        field[:] = lay.inf_field
+
+    frontiers = list(sources)
+    seen = list(sources)
+    dist = 0
+
+    while any(frontiers):
+        for k, frontier in enumerate(frontiers):
+            if not frontier:
+                continue
+
+            field = fields[k]
+            m = frontier
+            while m:
+                low = m & -m
+                field[low.bit_length() - 1] = dist
+                m ^= low
+
+            frontier = (((frontier & open_n) >> cols) | ((frontier & open_s) << cols) |
+                        ((frontier & open_e) >> 1) | ((frontier & open_w) << 1)) & ~seen[k]
+            seen[k] |= frontier
+            frontiers[k] = frontier
+
+        dist += 1
+
+    return fields
+
+
+def reachable(lay: Layout, blocked: List[int], source: int, target: int) -> bool:
+    """ Returns whether any square of the target mask can be reached
+    from the source mask. Iterative bit-parallel flood fill which stops
+    as soon as the target is touched. Pawns are ignored.
+    """
+    cols = lay.cols
+    open_n = lay.full & ~blocked[DIR.N]
+    open_s = lay.full & ~blocked[DIR.S]
+    open_e = lay.full & ~blocked[DIR.E]
+    open_w = lay.full & ~blocked[DIR.W]
+    seen = frontier = source
+
+    while frontier:
+        if seen & target:
+            return True
+
+        frontier = (((frontier & open_n) >> cols) | ((frontier & open_s) << cols) |
+                    ((frontier & open_e) >> 1) | ((frontier & open_w) << 1)) & ~seen
+        seen |= frontier
+
+    return False
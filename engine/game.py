@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+
+from typing import Set, List, Tuple, Union
+
+import config as cfg
+from config import DIR
+
+from ai.action import ActionMovePawn, ActionPlaceWall
+from entities.coord import Coord
+
+from .bitboard import layout, distance_fields, reachable, wall_index
+from .zobrist import zobrist
+from .pawn import Pawn
+from .wall import Wall
+from .wallgraph import WallGraph
+
+
+class Game:
+    """ Quoridor game state (walls, pawns and turn) and rules.
+    It has no UI dependencies, so it can be used headless (i.e. AI search,
+    network server).
+    """
+
+    def __init__(self, rows=cfg.DEF_ROWS, cols=cfg.DEF_COLS):
+        self.rows: int = rows
+        self.cols: int = cols
+        self.player: int = 0  # Current player 0 or 1
+        self.num_players = cfg.DEFAULT_NUM_PLAYERS
+
+        # Position hash keys (see engine.zobrist), updated on every change
+        self.zobrist = zobrist(rows, cols, self.num_players, cfg.NUM_WALLS)
+        self.key: int = self.zobrist.players[self.player]  # Whole position
+        self.wall_key: int = 0  # Walls only
+
+        # Bitboards (see engine.bitboard)
+        self.layout = layout(rows, cols)
+        self.hwalls: int = 0  # Horizontal walls placed on board
+        self.vwalls: int = 0  # Vertical walls placed on board
+        self.blocked: List[int] = list(self.layout.border)  # Blocked edges of each cell, per direction
+        self.occupied: int = 0  # Cells with a pawn
+        self.free_walls: int = self.layout.all_walls  # Walls (see wall_index) which collide with none on board
+        self.free_walls_stack: List[Tuple[int, int]] = []  # (wall index, free_walls before putting it)
+        self.wall_graph = WallGraph(self.layout)  # Connectivity of walls, to skip most path checks
+        self.undo_stack: List[int] = []  # Moved pawn origin square (or -1 for walls) of each make()
+
+        self.pawns: List[Pawn] = []
+        self.pawns += [Pawn(self, 0, coord=Coord(rows - 1, cols >> 1))]  # Centered
+        self.pawns += [Pawn(self, 1, coord=Coord(0, cols >> 1))]  # Centered
+
+    def in_range(self, coord: Coord) -> bool:
+        """ Returns whether te given coordinate are within the board or not
+        """
+        return 0 <= coord.col < self.cols and 0 <= coord.row < self.rows
+
+    def path(self, coord: Coord, direction: int) -> bool:
+        """ Returns whether there's a way from coord in the given direction
+        """
+        return not (self.blocked[direction] >> self.layout.square(coord)) & 1
+
+    def pawn_at(self, coord: Coord) -> Union[Pawn, None]:
+        """ Returns the pawn at the given coord, if any
+        """
+        for pawn in self.pawns:
+            if pawn.coord == coord:
+                return pawn
+
+        return None
+
+    def new_wall(self, coord: Coord, horiz: bool) -> Wall:
+        """ Wall factory. Creates a new wall
+        """
+        return Wall(coord, horiz)
+
+    @property
+    def walls(self) -> Set[Wall]:
+        """ Walls placed on board
+        """
+        result = set()
+        for slot in range(self.layout.num_slots):
+            for horiz, mask in ((True, self.hwalls), (False, self.vwalls)):
+                if (mask >> slot) & 1:
+                    result.add(self.new_wall(self.layout.slot_coord(slot), horiz))
+
+        return result
+
+    def has_wall(self, wall: Wall) -> bool:
+        """ Returns whether the given wall is on the board
+        """
+        mask = self.hwalls if wall.horiz else self.vwalls
+        return bool((mask >> self.layout.slot(wall.coord)) & 1)
+
+    def putWall(self, wall: Wall) -> None:
+        """ Puts the given wall (or anything with coord and horiz
+        attributes) on the board. The edges are blocked accordingly
+        """
+        self.put_wall(self.layout.slot(wall.coord), wall.horiz)
+
+    def removeWall(self, wall: Wall) -> None:
+        """ Removes a wall from the board.
+        The edges are unblocked accordingly
+        """
+        self.remove_wall(self.layout.slot(wall.coord), wall.horiz)
+
+    def put_wall(self, slot: int, horiz: bool) -> None:
+        """ Puts a wall at the given slot (bit index) and orientation
+        """
+        if horiz:
+            if (self.hwalls >> slot) & 1:
+                return  # If already put, nothing to do
+
+            self.hwalls |= 1 << slot
+            edges = self.layout.h_edges[slot]
+            self.blocked[DIR.S] |= edges
+            self.blocked[DIR.N] |= edges << self.cols
+        else:
+            if (self.vwalls >> slot) & 1:
+                return  # If already put, nothing to do
+
+            self.vwalls |= 1 << slot
+            edges = self.layout.v_edges[slot]
+            self.blocked[DIR.W] |= edges
+            self.blocked[DIR.E] |= edges << 1
+
+        zkey = self.zobrist.walls[horiz][slot]
+        self.key ^= zkey
+        self.wall_key ^= zkey
+
+        index = wall_index(slot, horiz)
+        self.free_walls_stack.append((index, self.free_walls))
+        self.free_walls &= ~self.layout.wall_conflicts[index]
+        self.wall_graph.add(index)
+
+    def remove_wall(self, slot: int, horiz: bool) -> None:
+        """ Removes the wall at the given slot (bit index) and orientation
+        """
+        if horiz:
+            if not (self.hwalls >> slot) & 1:
+                return  # Already removed, nothing to do
+
+            self.hwalls &= ~(1 << slot)
+            edges = self.layout.h_edges[slot]
+            self.blocked[DIR.S] &= ~edges
+            self.blocked[DIR.N] &= ~(edges << self.cols)
+        else:
+            if not (self.vwalls >> slot) & 1:
+                return  # Already removed, nothing to do
+
+            self.vwalls &= ~(1 << slot)
+            edges = self.layout.v_edges[slot]
+            self.blocked[DIR.W] &= ~edges
+            self.blocked[DIR.E] &= ~(edges << 1)
+
+        zkey = self.zobrist.walls[horiz][slot]
+        self.key ^= zkey
+        self.wall_key ^= zkey
+
+        index = wall_index(slot, horiz)
+        if self.free_walls_stack and self.free_walls_stack[-1][0] == index:
+            self.free_walls = self.free_walls_stack.pop()[1]
+            self.wall_graph.undo()
+        else:  # Not the last one put. Recompute them all
+            self.free_walls_stack.clear()
+            self.free_walls = self.layout.all_walls
+            self.wall_graph.clear()
+            for i in range(self.layout.num_slots):
+                for h, mask in ((False, self.vwalls), (True, self.hwalls)):
+                    if (mask >> i) & 1:
+                        self.free_walls &= ~self.layout.wall_conflicts[wall_index(i, h)]
+                        self.wall_graph.add(wall_index(i, h))
+
+    def collides(self, wall: Wall) -> bool:
+        """ Returns whether the given wall overlaps or crosses
+        any wall on the board
+        """
+        return not (self.free_walls >> wall_index(self.layout.slot(wall.coord), wall.horiz)) & 1
+
+    def can_put_wall(self, wall: Wall) -> bool:
+        """ Returns whether the given wall can be put
+        on the board.
+        """
+        if not self.current_player.walls:
+            return False
+
+        return self.can_put_wall_index(wall_index(self.layout.slot(wall.coord), wall.horiz))
+
+    def can_put_wall_index(self, index: int) -> bool:
+        """ Same as can_put_wall(), for the given wall index (see wall_index),
+        regardless of the walls left to the current player
+        """
+        # Check if any wall has already got that place...
+        if not (self.free_walls >> index) & 1:
+            return False
+
+        # A wall not closing a loop with others (or the border) can't cut any path
+        if not self.wall_graph.may_close(index):
+            return True
+
+        slot, horiz = index >> 1, index & 1
+        self.put_wall(slot, horiz)
+        result = all(reachable(self.layout, self.blocked, pawn.bit, pawn.goal_mask) for pawn in self.pawns)
+        self.remove_wall(slot, horiz)
+        return result
+
+    def do_action(self, action: Union[ActionPlaceWall, ActionMovePawn]):
+        """ Performs a playing action for the current player:
+        move a pawn or place a barrier.
+        """
+        if isinstance(action, ActionPlaceWall):
+            self.putWall(self.new_wall(action.coord, action.horiz))
+            self.current_player.walls -= 1
+        else:
+            self.current_player.move_to(action.dest)
+
+    def encode_action(self, action: Union[ActionPlaceWall, ActionMovePawn]) -> int:
+        """ Returns the action code of the given action. Codes are small
+        integers: the destination square for pawn moves, or layout.size plus
+        the wall index (see wall_index) for walls.
+        """
+        if isinstance(action, ActionPlaceWall):
+            return self.layout.size + wall_index(self.layout.slot(action.coord), action.horiz)
+
+        return self.layout.square(action.dest)
+
+    def decode_action(self, code: int) -> Union[ActionPlaceWall, ActionMovePawn]:
+        """ Returns the Action for the given action code of the current player
+        """
+        lay = self.layout
+        if code >= lay.size:
+            slot, horiz = divmod(code - lay.size, 2)
+            return ActionPlaceWall(self.new_wall(lay.slot_coord(slot), bool(horiz)))
+
+        return ActionMovePawn(self.current_player.coord, lay.coords[code])
+
+    def make(self, code: int) -> None:
+        """ Performs the given action code (see encode_action) for the current
+        player, repairing the pawns distances as well. Used by the search, which
+        must revert it with unmake(). Only ints are pushed into the undo stack.
+        """
+        player = self.current_player
+        size = self.layout.size
+        if code >= size:
+            index = code - size
+            self.put_wall(index >> 1, index & 1)
+            player.walls -= 1
+            for pawn in self.pawns:
+                pawn.distances.add_wall(index)
+            self.undo_stack.append(-1)
+        else:
+            self.undo_stack.append(player.square)
+            player.move_to_square(code)
+
+    def unmake(self, code: int) -> None:
+        """ Reverts the last make(code)
+        """
+        player = self.current_player
+        orig = self.undo_stack.pop()
+        if orig < 0:
+            index = code - self.layout.size
+            self.remove_wall(index >> 1, index & 1)
+            player.walls += 1
+            for pawn in self.pawns:
+                pawn.distances.undo_wall()
+        else:
+            player.move_to_square(orig)
+
+    def next_player(self):
+        """ Switches to next player
+        """
+        self.key ^= self.zobrist.players[self.player]
+        self.player = (self.player + 1) % self.num_players
+        self.key ^= self.zobrist.players[self.player]
+        self.update_pawns_distances()
+
+    def previous_player(self):
+        """ Switches to previous player.
+        """
+        self.key ^= self.zobrist.players[self.player]
+        self.player = (self.player + self.num_players - 1) % self.num_players
+        self.key ^= self.zobrist.players[self.player]
+
+    def update_pawns_distances(self):
+        """ Updates distances of every pawn. Those not memoized
+        are computed together in a single flood
+        """
+        missing = [pawn.distances for pawn in self.pawns if not pawn.distances.lookup()]
+        if not missing:
+            return
+
+        fields = [d.buffer for d in missing]
+        distance_fields(self.layout, self.blocked, [d.goal_mask for d in missing], fields)
+        for distances, field in zip(missing, fields):
+            distances.store(field)
+
+    @property
+    def current_player(self) -> Pawn:
+        """ Returns current player's pawn
+        """
+        return self.pawns[self.player]
+
+    @property
+    def finished(self):
+        """ Returns whether the match has finished or not.
+        """
+        return any(pawn.coord in pawn.goals for pawn in self.pawns)
+
+    @property
+    def state(self) -> str:
+        """ Status serialization in a string: current player,
+        pawns and wall bitmasks ('1' = wall). For hashing, use
+        the key attribute instead.
+        """
+        n = self.layout.num_slots
+        result = str(self.player)  # current player
+        result += ''.join(p.state for p in self.pawns)
+        result += format(self.hwalls, '0%ib' % n) + format(self.vwalls, '0%ib' % n)
+
+        return result
+
+    @state.setter
+    def state(self, state: str) -> None:
+        """ Restores a state serialized as above (i.e. in another process),
+        on a board of the same size
+        """
+        n = self.layout.num_slots
+        for horiz, mask in ((True, int(state[-2 * n:-n], 2)), (False, int(state[-n:], 2))):
+            current = self.hwalls if horiz else self.vwalls
+            for slot in range(n):
+                if (mask >> slot) & 1 and not (current >> slot) & 1:
+                    self.put_wall(slot, horiz)
+                elif not (mask >> slot) & 1 and (current >> slot) & 1:
+                    self.remove_wall(slot, horiz)
+
+        for i, pawn in enumerate(self.pawns):
+            pawn_state = state[1 + 4 * i:5 + 4 * i]
+            pawn.move_to(Coord(int(pawn_state[0]), int(pawn_state[1])))
+            pawn.walls = int(pawn_state[2:])
+
+        # A pawn moved onto the square another one was leaving has just lost its bit
+        self.occupied = 0
+        for pawn in self.pawns:
+            self.occupied |= pawn.bit
+
+        player = int(state[0])
+        self.key ^= self.zobrist.players[self.player] ^ self.zobrist.players[player]
+        self.player = player
+        for pawn in self.pawns:
+            pawn.distances.update()
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+from typing import List, Set
+
+import config as cfg
+import core
+
+from entities.coord import Coord
+
+from .bitboard import reachable
+
+
+class Pawn:
+    """ Player pawn game state: position, goals and remaining walls.
+    """
+    goals: Set[Coord] = None
+
+    def __init__(self,
+                 game,  # parent object
+                 id_: int,
+                 coord: Coord,
+                 walls=cfg.NUM_WALLS):
+        self.game = game
+        self.id = id_
+        self._coord = None
+        self.bit = 0  # Occupancy bit of this pawn's cell
+        self.move_to(coord)
+        self._walls = walls  # Walls per player
+        self.game.key ^= self.game.zobrist.wall_counts[self.id][walls]
+        self.set_goal()
+        self.AI = None
+        self.percent = None
+        self.distances = core.DistArray(self)
+
+    def set_goal(self):
+        """ Sets a list of possible goals (cells) for this
+        player.
+        """
+        if self.coord.row == 0:
+            self.goals = {Coord(self.game.rows - 1, x) for x in range(self.game.cols)}
+        elif self.coord.row == self.game.rows - 1:
+            self.goals = {Coord(0, x) for x in range(self.game.cols)}
+        elif self.coord.col == self.game.cols - 1:
+            self.goals = {Coord(x, 0) for x in range(self.game.cols)}
+        else:
+            self.goals = {Coord(x, self.game.cols - 1) for x in range(self.game.rows)}
+
+        self.goal_mask = sum(1 << self.game.layout.square(goal) for goal in self.goals)
+
+    def is_free(self, coord: Coord) -> bool:
+        """ Returns whether no other pawn is at the given coord
+        """
+        return not ((self.game.occupied & ~self.bit) >> self.game.layout.square(coord)) & 1
+
+    def can_go(self, direction: int) -> List[Coord]:
+        """ Direction is one of 'N', 'S', 'E', 'W'
+        Returns te list of new coordinates the pawn can move by going into that direction, or None otherwise.
+        Usually it's just one coordinate or empty (not possible), but sometimes it can be two coordinates if the
+        pawn can move diaginally by jumping a confronting opponent.
+        """
+        coords = self.game.layout.coords
+        return [coords[sq] for sq in self.go_squares(direction, self.square)]
+
+    def go_squares(self, direction: int, sq: int) -> List[int]:
+        """ Same as can_go(), from the given square, as square indexes
+        """
+        blocked = self.game.blocked
+        if (blocked[direction] >> sq) & 1:
+            return []  # Blocked in that direction (or board border)
+
+        lay = self.game.layout
+        new_sq = lay.neighbours[direction][sq]
+        others = self.game.occupied & ~self.bit
+        if not (others >> new_sq) & 1:  # Is it free?
+            return [new_sq]
+
+        # Ok there's a pawn at new_sq. Check for adjacent
+        return [sq2 for di, sq2 in lay.jumps[direction][new_sq]
+                if not (blocked[di] >> new_sq) & 1 and not (others >> sq2) & 1]
+
+    @property
+    def move_squares(self) -> List[int]:
+        """ Valid moves as a list of destination squares
+        """
+        result: List[int] = []
+
+        if self._coord is None:
+            return result
+
+        game = self.game
+        blocked = game.blocked
+        lay = game.layout
+        others = game.occupied & ~self.bit
+        sq = self.bit.bit_length() - 1
+
+        for d in range(4):  # Try each direction
+            if (blocked[d] >> sq) & 1:
+                continue
+
+            new_sq = lay.neighbours[d][sq]
+            if not (others >> new_sq) & 1:
+                result.append(new_sq)
+                continue
+
+            for di, sq2 in lay.jumps[d][new_sq]:  # Jumping the pawn there
+                if not (blocked[di] >> new_sq) & 1 and not (others >> sq2) & 1:
+                    result.append(sq2)
+
+        return result
+
+    @property
+    def valid_moves(self) -> List[Coord]:
+        """ Returns a list of valid moves as list of coordinates
+        """
+        coords = self.game.layout.coords
+        return [coords[sq] for sq in self.move_squares]
+
+    def valid_moves_from(self, coord: Coord) -> List[Coord]:
+        """ Returns a list of valid moves from coord(row, col).
+        (i, j) can be a different position from the
+        current one.
+        """
+        lay = self.game.layout
+        sq = lay.square(coord)
+        return [lay.coords[x] for d in cfg.DIRS for x in self.go_squares(d, sq)]
+
+    def can_move(self, coord: Coord) -> bool:
+        """ Returns whether the pawn can move to position
+        (i, j)
+        """
+        return coord in self.valid_moves
+
+    def move_to(self, coord: Coord) -> None:
+        """ Places pawn at i, j. For a valid move, can_move should
+        be called first.
+        """
+        if self.game.in_range(coord):
+            self.move_to_square(self.game.layout.square(coord))
+
+    def move_to_square(self, sq: int) -> None:
+        """ Places pawn at the given square index
+        """
+        game = self.game
+        keys = game.zobrist.pawns[self.id]
+        if self._coord is not None:
+            game.key ^= keys[self.square]
+
+        self._coord = game.layout.coords[sq]
+        game.key ^= keys[sq]
+        game.occupied &= ~self.bit
+        self.bit = 1 << sq
+        game.occupied |= self.bit
+
+    def can_reach_goal(self) -> bool:
+        """ True if this player can reach a goal,
+        false if it is blocked and there's no way to reach it.
+        Only walls are taken into account (pawns can be jumped over).
+        """
+        return reachable(self.game.layout, self.game.blocked, self.bit, self.goal_mask)
+
+    @property
+    def state(self):
+        """ Returns a string containing i,j,w being i, j the pawn coordinates
+        and w the number of remaining walls
+        """
+        return '%i%i%02i' % (self._coord.row, self._coord.col, self.walls)
+
+    @property
+    def walls(self) -> int:
+        """ Number of walls left
+        """
+        return self._walls
+
+    @walls.setter
+    def walls(self, walls: int) -> None:
+        keys = self.game.zobrist.wall_counts[self.id]
+        self.game.key ^= keys[self._walls] ^ keys[walls]
+        self._walls = walls
+
+    @property
+    def square(self) -> int:
+        """ Square index (see engine.bitboard) of the pawn
+        """
+        return self.bit.bit_length() - 1
+
+    @property
+    def coord(self) -> Coord:
+        """ Returns pawn coordinate (row, col)
+        """
+        return self._coord
+
+    @coord.setter
+    def coord(self, coord: Coord) -> None:
+        self.move_to(coord)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+from typing import List, Tuple
+
+from .bitboard import Layout
+
+__doc__ = """ Connectivity of the walls on board.
+
+Walls (and the board border) are segments joining lattice points, see
+Layout.wall_points. A new wall can only split a region of the board in two
+if it closes a loop, that is, if two of its points were already connected
+through other walls or the border. Otherwise the wall can't disconnect any
+cell and it is legal without any path search.
+"""
+
+
+class WallGraph:
+    """ Union-find over lattice points with rollback (union by size and no
+    path compression), so walls put during the search can be undone in LIFO
+    order at no cost.
+    """
+    def __init__(self, lay: Layout):
+        self.layout = lay
+        self.parent: List[int] = list(range(lay.num_points))
+        self.size: List[int] = [1] * lay.num_points
+        self.stack: List[Tuple[int, ...]] = []  # Roots joined by each wall (child roots)
+
+    def find(self, point: int) -> int:
+        parent = self.parent
+        while parent[point] != point:
+            point = parent[point]
+
+        return point
+
+    def may_close(self, index: int) -> bool:
+        """ Whether the wall with the given index (see wall_index) touches
+        the same component at two or more points, so it might close a region
+        """
+        a, b, c = self.layout.wall_points[index]
+        a, b, c = self.find(a), self.find(b), self.find(c)
+        return a == b or b == c or a == c
+
+    def add(self, index: int) -> None:
+        """ Joins the points of the given wall
+        """
+        joined = []
+        points = self.layout.wall_points[index]
+        root = self.find(points[0])
+        for point in points[1:]:
+            other = self.find(point)
+            if other == root:
+                continue
+
+            if self.size[other] > self.size[root]:
+                root, other = other, root
+
+            self.parent[other] = root
+            self.size[root] += self.size[other]
+            joined.append(other)
+
+        self.stack.append(tuple(joined))
+
+    def undo(self) -> None:
+        """ Removes the last wall added
+        """
+        for other in reversed(self.stack.pop()):
+            root = self.parent[other]
+            self.size[root] -= self.size[other]
+            self.parent[other] = other
+
+    def clear(self) -> None:
+        self.parent[:] = range(self.layout.num_points)
+        self.size[:] = [1] * self.layout.num_points
+        self.stack.clear()
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+import random
+from functools import lru_cache
+
+from .bitboard import layout
+
+__doc__ = """ Zobrist hashing of game positions.
+
+A position key is the XOR of one random 64 bit number per feature (each wall,
+each pawn cell, each pawn wall count and the player to move), so it can be
+updated incrementally with a couple of XORs on every make / unmake.
+"""
+
+SEED = 0x5155_4f52  # Fixed, so keys are the same on every process / run
+
+
+class Zobrist:
+    """ Random keys for every position feature.
+    Use zobrist() to get a shared instance.
+    """
+    def __init__(self, rows: int, cols: int, num_players: int, num_walls: int):
+        lay = layout(rows, cols)
+        rnd = random.Random(SEED)
+
+        def keys(n):
+            return [rnd.getrandbits(64) for _ in range(n)]
+
+        self.walls = [keys(lay.num_slots), keys(lay.num_slots)]  # Indexed by [horiz][slot]
+        self.pawns = [keys(lay.size) for _ in range(num_players)]  # Indexed by [pawn id][square]
+        self.wall_counts = [keys(num_walls + 1) for _ in range(num_players)]  # Indexed by [pawn id][walls left]
+        self.players = keys(num_players)  # Player to move
+
+
+@lru_cache(maxsize=None)
+def zobrist(rows: int, cols: int, num_players: int, num_walls: int) -> Zobrist:
+    """ Returns the (shared) Zobrist keys for the given game size
+    """
+    return Zobrist(rows, cols, num_players, num_walls)
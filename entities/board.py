@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from typing import Set, List, Union
+from typing import List, Union
 import pygame
 
 from helpers import log
@@ -8,7 +8,8 @@ from network.server import EnhancedServer, Functions
 import config as cfg
 
 from ai.action import ActionMovePawn, ActionPlaceWall
-from ai.ai import AI
+from ai.process import AIProcess
+from engine.game import Game
 
 from .drawable import Drawable
 from .pawn import Pawn
@@ -16,12 +17,11 @@ from .cell import Cell
 from .wall import Wall
 from .coord import Coord
 
-from config import DIR
-
 
 class Board(Drawable):
     """ Quoridor board.
-    This object contains te state of the game.
+    This object paints the state of the game (see engine.game.Game)
+    and dispatches user input to it.
     """
 
     def __init__(self,
@@ -34,14 +34,13 @@ class Board(Drawable):
                  border_size=cfg.BOARD_BRD_SIZE):
 
         Drawable.__init__(self, screen=screen, color=color, border_color=border_color, border_size=border_size)
+        self.game = Game(rows, cols)
         self.rows: int = rows
         self.cols: int = cols
         self.cell_pad = cell_padding
         self.mouse_wall = None  # Wall painted on mouse move
-        self.player: int = 0  # Current player 0 or 1
         self.board: List[List[Cell]] = []
         self.computing = False  # True if a non-human player is moving
-        self._state = None
 
         # Create NETWORK server
         try:
@@ -63,25 +62,23 @@ class Board(Drawable):
         self.pawns: List[Pawn] = []
         self.pawns += [Pawn(screen=screen,
                             board=self,
+                            pawn=self.game.pawns[0],
                             color=cfg.PAWN_A_COL,
                             border_color=cfg.PAWN_BORDER_COL,
-                            coord=Coord(rows - 1, cols >> 1),  # Centered
                             # URL = SERVER_URL + ':%i' % (BASE_PORT + PAWNS)
                             )]
         self.pawns += [Pawn(screen=screen,
                             board=self,
+                            pawn=self.game.pawns[1],
                             color=cfg.PAWN_B_COL,
                             border_color=cfg.PAWN_BORDER_COL,
-                            coord=Coord(0, col=cols >> 1)  # Centered
                             )]
 
         self.regenerate_board(cfg.CELL_COLOR, cfg.CELL_BORDER_COLOR)
-        self.num_players = cfg.DEFAULT_NUM_PLAYERS
-        self.walls: Set[Wall] = set()  # Walls placed on board
         self.draw_players_info()
-        self._AI = []
-        # self._AI += [AI(self.pawns[0])]
-        self._AI += [AI(self.pawns[1], level=cfg.LEVEL)]
+        # Computer players, (pawn id, level), run in a separate process
+        self.ai_process = AIProcess(self.game, [(1, cfg.LEVEL)])
+        self._AI = self.ai_process.ais
 
     def regenerate_board(self, c_color, cb_color, c_width=cfg.CELL_WIDTH, c_height=cfg.CELL_HEIGHT):
         """ Regenerate board colors and get_cell positions.
@@ -98,13 +95,9 @@ class Board(Drawable):
                 cell.border_color = cb_color
                 cell.height = c_height
                 cell.width = c_width
-                cell.pawn = None
                 x += c_width + self.cell_pad
             y += c_height + self.cell_pad
 
-        for pawn in self.pawns:
-            pawn.cell = self.get_cell(pawn.coord)
-
     def draw(self):
         """ Draws a squared n x n board, defaults
         to the standard 9 x 9
@@ -118,11 +111,24 @@ class Board(Drawable):
         if cfg.__DEBUG__:
             for p in self.pawns:
                 if p.AI:
-                    p.distances.draw()
+                    self.draw_distances(p)
                     break
 
-        for wall in self.walls:
-            wall.draw()
+        for wall in self.game.walls:
+            self.new_wall(wall.coord, wall.horiz).draw()
+
+    def draw_distances(self, pawn):
+        """ Displays distance numbers of the given pawn in the screen
+        """
+        for i in range(self.rows):
+            for j in range(self.cols):
+                r = self.board[i][j].rect
+                r.x = r.x + r.width - cfg.FONT_SIZE
+                r.y = r.y + r.height - cfg.FONT_SIZE
+                r.width = cfg.FONT_SIZE
+                r.height = cfg.FONT_SIZE
+                pygame.draw.rect(self.screen, cfg.FONT_BG_COLOR, r, 0)  # Erases previous number
+                self.msg(r.x, r.y, str(pawn.distances[i][j]))
 
     def get_cell(self, coord: Coord) -> Cell:
         """ Returns board get_cell at the given the coord
@@ -141,45 +147,16 @@ class Board(Drawable):
     def in_range(self, coord: Coord) -> bool:
         """ Returns whether te given coordinate are within the board or not
         """
-        return 0 <= coord.col < self.cols and 0 <= coord.row < self.rows
-
-    def putWall(self, wall: Wall) -> None:
-        """ Puts the given wall on the board.
-        The cells are updated accordingly
-        """
-        if wall in self.walls:
-            return  # If already put, nothing to do
-
-        self.walls.add(wall)
-        i, j = wall.coord
-
-        if wall.horiz:
-            self.board[i][j].set_path(DIR.S, False)
-            self.board[i][j + 1].set_path(DIR.S, False)
-        else:
-            self.board[i][j].set_path(DIR.W, False)
-            self.board[i + 1][j].set_path(DIR.W, False)
-
-        self._state = None
+        return self.game.in_range(coord)
 
-    def removeWall(self, wall: Wall) -> None:
-        """ Removes a wall from the board.
-        The cells are updated accordingly
+    def pawn_at(self, coord: Coord) -> Union[Pawn, None]:
+        """ Returns the pawn at the given coord, if any
         """
-        if wall not in self.walls:
-            return  # Already removed, nothing to do
-
-        self.walls.remove(wall)
-        i, j = wall.coord
-
-        if wall.horiz:
-            self.board[i][j].set_path(DIR.S, True)
-            self.board[i][j + 1].set_path(DIR.S, True)
-        else:
-            self.board[i][j].set_path(DIR.W, True)
-            self.board[i + 1][j].set_path(DIR.W, True)
+        for pawn in self.pawns:
+            if pawn.coord == coord:
+                return pawn
 
-        self._state = None
+        return None
 
     def onMouseClick(self, x, y):
         """ Dispatch mouse click Event
@@ -206,7 +183,7 @@ class Board(Drawable):
         if not wall:
             return
 
-        if self.can_put_wall(wall):
+        if self.game.can_put_wall(wall):
             self.do_action(ActionPlaceWall(wall))
             self.next_player()
             self.draw_players_info()
@@ -235,34 +212,11 @@ class Board(Drawable):
         if not wall:
             return
 
-        if self.can_put_wall(wall):
+        if self.game.can_put_wall(wall):
             self.mouse_wall = wall
             self.draw()
             wall.draw()
 
-    def can_put_wall(self, wall) -> bool:
-        """ Returns whether the given wall can be put
-        on the board.
-        """
-        if not self.current_player.walls:
-            return False
-
-        # Check if any wall has already got that place...
-        for w in self.walls:
-            if wall.collides(w):
-                return False
-
-        result = True
-        self.putWall(wall)
-
-        for pawn in self.pawns:
-            if not pawn.can_reach_goal():
-                result = False
-                break
-
-        self.removeWall(wall)
-        return result
-
     def wall(self, x, y) -> Union[Wall, None]:
         """ Factory which returns which wall is below mouse cursor at x, y coords.
         Returns None if no wall matches x, y coords
@@ -320,15 +274,16 @@ class Board(Drawable):
     def rect(self):
         return pygame.Rect(self.x, self.y, self.width, self.height)
 
+    @property
+    def player(self) -> int:
+        """ Current player 0 or 1
+        """
+        return self.game.player
+
     def next_player(self):
         """ Switches to next player
         """
-        self.player = (self.player + 1) % self.num_players
-        self.update_pawns_distances()
-
-    def update_pawns_distances(self):
-        for pawn in self.pawns:
-            pawn.distances.update()
+        self.game.next_player()
 
     def which_cell(self, x, y):
         """ Returns an instance of the get_cell for which (x, y) screen coord
@@ -410,53 +365,54 @@ class Board(Drawable):
         if isinstance(action, ActionPlaceWall):
             wdir = 'horizontal' if action.horiz else 'vertical'
             log('Player %i places %s wall at (%i, %i)' % (player_id, wdir, action.coord.col, action.coord.row))
-            self.putWall(self.new_wall(action.coord, action.horiz))
-            self.current_player.walls -= 1
         else:
             log('Player %i moves to (%i, %i)' % (player_id, action.dest.row, action.dest.col))
-            self.current_player.move_to(action.dest)
-            self._state = None
+
+        self.game.do_action(action)
 
         for pawn in self.pawns:
             if pawn.is_network_player:
                 pawn.NETWORK.do_action(action)
 
     def computer_move(self):
-        """ Performs computer moves for every non-human player
+        """ Asks the AI process for the move of the current (computer)
+        player. It is performed later, by update_computer_move
         """
-        while self.current_player.AI and not self.finished:
-            self.draw()
-            self.draw_players_info()
-            action, x = self.current_player.AI.move()
+        self.computing = True
+        self.draw()
+        self.draw_players_info()
+        self.ai_process.move(self.current_player.id, self.game.state)
+
+    def update_computer_move(self):
+        """ Handles the AI process messages, if any, without waiting:
+        draws its progress and performs its moves
+        """
+        for message in self.ai_process.poll():
+            pawn_id = message[1]
+            if message[0] == 'progress':
+                self.game.pawns[pawn_id].percent = message[2]
+                self.draw_player_info(pawn_id)
+                continue
+
             pygame.mixer.music.load('./media/chime.ogg')
             pygame.mixer.music.play()
-            self.do_action(action)
+            self.do_action(self.game.decode_action(message[2]))
+            if not self.finished:
+                self.next_player()
+                if cfg.AI_PONDER and not self.current_player.AI:
+                    self.ai_process.ponder(pawn_id, self.game.state)  # While the opponent thinks
 
-            if self.finished:
-                break
-
-            self.next_player()
+            self.draw()
+            self.draw_players_info()
+            self.computing = False
 
-        self.draw()
-        self.draw_players_info()
-        self.computing = False
+    def stop_computer_move(self):
+        """ The AI plays now the best move found so far
+        """
+        self.ai_process.stop_now()
 
     @property
     def finished(self):
         """ Returns whether the match has finished or not.
         """
-        return any(pawn.coord in pawn.goals for pawn in self.pawns)
-
-    @property
-    def state(self):
-        """ Status serialization in a t-uple
-        """
-        if self._state is not None:
-            return self._state
-
-        result = str(self.player)  # current player
-        result += ''.join(p.state for p in self.pawns)
-        result += ''.join(self.board[i][j].state for j in range(self.cols - 1) for i in range(self.rows - 1))
-        self._state = result
-
-        return result
+        return self.game.finished
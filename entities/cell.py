@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 
-from typing import List
 import pygame
 
 import config as cfg
@@ -23,8 +22,7 @@ class Cell(Drawable):
                  wall_color=cfg.WALL_COLOR,
                  focus_color=cfg.CELL_VALID_COLOR,
                  border_color=cfg.CELL_BORDER_COLOR,
-                 border_size=cfg.CELL_BORDER_SIZE,
-                 pawn=None  # Reference to the Pawn this get_cell contains or None
+                 border_size=cfg.CELL_BORDER_SIZE
                  ):
 
         super().__init__(screen, color, border_color, border_size)
@@ -35,36 +33,16 @@ class Cell(Drawable):
         self.wall_color = wall_color
         self.normal_color = color
         self.focus_color = focus_color
-        self.pawn = pawn
         self.board = board
         self.walls = []  # Walls lists
         self.coord = coord
         self.has_focus: bool = False  # True if mouse on get_cell
 
-        # Available paths
-        self.path: List[bool] = [True] * len(cfg.DIRS)
-
-        if coord.row == 0:
-            self.set_path(cfg.DIR.N, False)
-        elif coord.row == self.board.rows - 1:
-            self.set_path(cfg.DIR.S, False)
-
-        if coord.col == 0:
-            self.set_path(cfg.DIR.E, False)
-        elif coord.col == self.board.cols - 1:
-            self.set_path(cfg.DIR.W, False)
-
-    def set_path(self, direction: int, value: bool) -> None:
-        """ Sets the path 'N', 'S', 'W', E', to True or False.
-        False means no way in that direction. Updates neighbour
-        cells accordingly.
+    @property
+    def pawn(self):
+        """ Returns the Pawn this get_cell contains or None
         """
-        self.path[direction] = value
-        new_coord = self.coord + cfg.DIRS_DELTA[direction]
-        if not self.board.in_range(new_coord):
-            return  # Nothing to do
-
-        self.board.get_cell(new_coord).path[cfg.OPPOSITE_DIRS[direction]] = value
+        return self.board.pawn_at(self.coord)
 
     def draw(self):
         Drawable.draw(self)
@@ -96,9 +74,3 @@ class Cell(Drawable):
         """ Returns Cell owns rect
         """
         return pygame.Rect(self.x, self.y, self.width, self.height)
-
-    @property
-    def state(self) -> str:
-        """ Returns Cell state as a string
-        """
-        return ''.join('01'[self.path[d]] for d in (cfg.DIR.S, cfg.DIR.W))
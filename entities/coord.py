@@ -23,16 +23,30 @@ class CoordMixIn:
 
 class Coord(CoordMixIn):
     """ Coordinate (immutable) object (row, col).
+    Instances are interned (flyweight): there's only one per (row, col), so
+    creating them is just a dict lookup, and equal coords are identical.
     """
     __slots__ = '_hash'
+    _interned = {}
 
-    def __init__(self, row: int, col: int):
-        self.row = row
-        self.col = col
-        self._hash = hash((self.row, self.col))
+    def __new__(cls, row: int, col: int):
+        try:
+            return cls._interned[row, col]
+        except KeyError:
+            pass
+
+        result = super().__new__(cls)
+        result.row = row
+        result.col = col
+        result._hash = hash((row, col))
+        cls._interned[row, col] = result
+        return result
+
+    def __reduce__(self):
+        return self.__class__, (self.row, self.col)
 
     def __eq__(self, other: CoordMixIn) -> bool:
-        return (self.row, self.col) == (other.row, other.col)
+        return self is other or (self.row, self.col) == (other.row, other.col)
 
     def __hash__(self):
         return self._hash
@@ -44,7 +58,7 @@ class Coord(CoordMixIn):
         return Coord(self.row - other.row, self.col - other.col)
 
     def __copy__(self):
-        return self.__class__(self.row, self.col)
+        return self  # Immutable and interned
 
     def copy(self):
         return self.__copy__()
@@ -2,12 +2,12 @@
 
 import pygame
 
+import engine.wall
 from .drawable import Drawable
 from .coord import Coord
-from config import DIR, DIRS_DELTA
 
 
-class Wall(Drawable):
+class Wall(engine.wall.Wall, Drawable):
     """ Class for painting a Wall
     """
     def __init__(self,
@@ -17,34 +17,9 @@ class Wall(Drawable):
                  coord: Coord = None,  # Wall coordinates
                  horiz: bool = None,  # whether this wall lays horizontal o vertically
                  ):
-        super().__init__(screen, color)
+        engine.wall.Wall.__init__(self, coord, horiz)
+        Drawable.__init__(self, screen, color)
         self.board = board
-        self.horiz: bool = horiz
-        self.coord = coord
-        self._hash = hash((self.horiz, self.coord))
-
-    def __eq__(self, other) -> bool:
-        assert isinstance(other, Wall)
-        return self.horiz == other.horiz and self.coord == other.coord
-
-    def __repr__(self):
-        return "<Wall: %i, %i, %i>" % (self.coord.row, self.coord.col, int(self.horiz))
-
-    def __hash__(self):
-        return self._hash
-
-    @property
-    def coords(self):
-        """ Returns a list with 2 t-uples containing coord of
-        wall cells. Cells are top / left to the wall.
-        """
-        if self.horiz is None or self.coord is None:
-            return None
-
-        if self.horiz:
-            return [self.coord, self.coord + DIRS_DELTA[DIR.W]]
-
-        return [self.coord, self.coord + DIRS_DELTA[DIR.N]]
 
     @property
     def rect(self):
@@ -71,26 +46,3 @@ class Wall(Drawable):
             return
 
         pygame.draw.rect(self.screen, self.color, self.rect, 0)
-
-    def collides(self, wall):
-        """ Returns if the given wall collides with this one
-        """
-        if self.horiz == wall.horiz:
-            wc = wall.coords
-            for c in self.coords:
-                if c in wc:
-                    return True
-
-            return False
-
-        # Only can collide if they form a cross
-        if self.coord == wall.coord:
-            return True
-
-        return False
-
-    @property
-    def state(self) -> str:
-        """ Returns a string containing IJH
-        """
-        return "%i%i%i" % (self.coord.row, self.coord.col, self.horiz)
@@ -12,7 +12,7 @@ import core
 from ai.action import Action
 
 
-class EnhancedServer(SimpleXMLRPCServer, ThreadingMixIn):
+class EnhancedServer(ThreadingMixIn, SimpleXMLRPCServer):
     """ Enhanced XML-RPC Server with some extended/overloaded functions.
     """
     def __init__(self, *args, **kwargs):
@@ -5,7 +5,6 @@ import os
 import pygame
 from pygame.locals import *
 from pygame import Color
-import threading
 import argparse
 
 from helpers import log, LogLevel
@@ -24,6 +23,9 @@ def dispatch(events, board: Board):
             if event.key == K_ESCAPE or board.finished:
                 return False
 
+            if event.type == KEYDOWN and event.key == K_SPACE and board.computing:
+                board.stop_computer_move()  # Move now
+
         if board.computing or board.finished or board.current_player.is_network_player:
             continue
 
@@ -46,6 +48,36 @@ def main() -> int:
                         help="AI player Level. Default is 0 (Easy). Higher is harder)",
                         default=cfg.LEVEL, type=int)
 
+    parser.add_argument('-t', '--movetime',
+                        help="AI time per move, in seconds. It searches as deep as it can (level is ignored)",
+                        default=cfg.MOVETIME, type=float)
+
+    parser.add_argument('-n', '--nodes',
+                        help="AI nodes searched per move. It searches as deep as it can (level is ignored)",
+                        default=cfg.NODES, type=int)
+
+    parser.add_argument('-e', '--engine',
+                        help="AI engine: minimax (default) or mcts (Monte Carlo Tree Search)",
+                        default=cfg.AI_ENGINE, choices=('minimax', 'mcts'))
+
+    parser.add_argument('-p', '--ponder',
+                        help="AI keeps searching while the opponent thinks", action='store_true')
+
+    parser.add_argument('-s', '--selective',
+                        help="AI null move pruning and late move reductions: deeper searches in the same time, "
+                             "but every level plays differently", action='store_true')
+
+    parser.add_argument('-z', '--zone',
+                        help="AI searches only walls within this distance of the pawns, their paths or other walls "
+                             "(every level plays differently)", default=cfg.AI_ZONE_RADIUS, type=int)
+
+    parser.add_argument('-j', '--threads',
+                        help="AI search processes. Default is 1", default=cfg.AI_THREADS, type=int)
+
+    parser.add_argument('-w', '--workers',
+                        help="AI distributed search, with this number of local workers (more can join remotely)",
+                        default=None, type=int)
+
     parser.add_argument('-d', '--debug',
                         help="Debug mode", action='store_true')
 
@@ -54,6 +86,17 @@ def main() -> int:
 
     options = parser.parse_args()
     cfg.LEVEL = options.level
+    cfg.MOVETIME = options.movetime
+    cfg.NODES = options.nodes
+    cfg.AI_ENGINE = options.engine
+    cfg.AI_PONDER = options.ponder
+    if options.selective:
+        cfg.AI_NULL_MOVE = cfg.AI_LMR = True
+    cfg.AI_ZONE_RADIUS = options.zone
+    cfg.AI_THREADS = options.threads
+    if options.workers is not None:
+        cfg.AI_DISTRIBUTED = True
+        cfg.AI_DIST_WORKERS = options.workers
     cfg.__DEBUG__ = options.debug
     cfg.CACHE_ENABLED = options.cache
 
@@ -61,6 +104,15 @@ def main() -> int:
     log('This program is Free')
     log('Initializing system...')
 
+    if cfg.CACHE_ENABLED:
+        if not os.path.exists(cfg.CACHE_DIR):
+            log('Cache directory {} not found. Creating it...'.format(cfg.CACHE_DIR))
+            os.makedirs(cfg.CACHE_DIR, exist_ok=True)
+
+        if not os.path.isdir(cfg.CACHE_DIR):
+            log('Could not create cache directory {}. Caching disabled'.format(cfg.CACHE_DIR), LogLevel.ERROR)
+            cfg.CACHE_ENABLED = False
+
     pygame.init()
     clock = pygame.time.Clock()
     pygame.display.set_mode((800, 600))
@@ -72,15 +124,6 @@ def main() -> int:
     board.draw()
     log('System initialized OK')
 
-    if cfg.CACHE_ENABLED:
-        if not os.path.exists(cfg.CACHE_DIR):
-            log('Cache directory {} not found. Creating it...'.format(cfg.CACHE_DIR))
-            os.makedirs(cfg.CACHE_DIR, exist_ok=True)
-
-        if not os.path.isdir(cfg.CACHE_DIR):
-            log('Could not create cache directory {}. Caching disabled'.format(cfg.CACHE_DIR), LogLevel.ERROR)
-            cfg.CACHE_ENABLED = False
-
     cont = True
     while cont:
         clock.tick(cfg.FRAMERATE)
@@ -88,9 +131,13 @@ def main() -> int:
 
         if not board.computing and not board.finished:
             if board.current_player.AI:
-                board.computing = True
-                thread = threading.Thread(target=board.computer_move)
-                thread.start()
+                board.computer_move()
+
+        try:
+            board.update_computer_move()
+        except RuntimeError as e:  # The AI process died
+            log(str(e), LogLevel.ERROR)
+            break
 
         cont = dispatch(pygame.event.get(), board)
 
@@ -100,17 +147,7 @@ def main() -> int:
     if cfg.NETWORK_ENABLED:
         board.server.terminate()
 
-    if cfg.CACHE_ENABLED:
-        for pawn in board.pawns:
-            if pawn.AI is not None:
-                pawn.AI.flush_cache()
-
-    log('Memoized nodes: %i' % core.MEMOIZED_NODES)
-    log('Memoized nodes hits: %i' % core.MEMOIZED_NODES_HITS)
-
-    for pawn in board.pawns:
-        log('Memoized distances for [%i]: %i' % (pawn.id, pawn.distances.MEMO_COUNT))
-        log('Memoized distances hits for [%i]: %i' % (pawn.id, pawn.distances.MEMO_HITS))
+    board.ai_process.close()  # It logs the AI statistics
 
     log('Exiting. Bye!')
     return 0
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+import pytest
+
+import config as cfg
+import core
+from ai import batch
+from ai.ai import AI, WIN
+from config import INF
+from engine.bitboard import reachable
+from engine.game import Game
+
+# Same walls, pawns swapped. Wall 97 is legal only in the second one
+STATE = '0%s05%s050000100000000000100000000000001000100001100000000101000000000000000000100000000000100000' \
+        '0100000000000000010010010000000000010000'
+
+
+def test_wall_memo_pawns_swapped():
+    """ The put-wall legality memo tells apart which pawn is on each square
+    """
+    core.init()
+    game = Game()
+    ai = AI(game.pawns[0])
+    size = game.layout.size
+
+    game.state = STATE % ('66', '70')
+    assert size + 97 in ai.actions()
+
+    game.state = STATE % ('70', '66')
+    assert not game.can_put_wall_index(97)
+    assert size + 97 not in ai.actions()
+
+
+def brute_actions(game: Game) -> list:
+    """ Every legal action code, walls checked by putting them and flooding
+    """
+    player = game.current_player
+    result = list(player.move_squares)
+    if player.walls:
+        result += [game.layout.size + index for index in range(2 * game.layout.num_slots)
+                   if flood_legal(game, index)]
+
+    return result
+
+
+def flood_legal(game: Game, index: int) -> bool:
+    if not (game.free_walls >> index) & 1:
+        return False
+
+    game.put_wall(index >> 1, index & 1)
+    result = all(reachable(game.layout, game.blocked, pawn.bit, pawn.goal_mask) for pawn in game.pawns)
+    game.remove_wall(index >> 1, index & 1)
+    return result
+
+
+def brute_leaf(game: Game, action: int) -> tuple:
+    """ (action, h1, hh1) as AI.leaves() evaluates them
+    """
+    player = game.current_player
+    game.make(action)
+    game.update_pawns_distances()
+    result = (action, player.distances.shortest_path_len,
+              min([pawn.distances.shortest_path_len for pawn in game.pawns if pawn is not player]))
+    game.unmake(action)
+    return result
+
+
+def negamax(game: Game, depth: int, ilevel: int = 0) -> int:
+    """ Plain negamax, as AI.think values the position
+    """
+    player = game.current_player
+    best = -INF
+    for action, h1, hh1 in [brute_leaf(game, action) for action in brute_actions(game)]:
+        if action < game.layout.size and (player.goal_mask >> action) & 1:
+            value = WIN - ilevel
+        elif not depth:
+            value = hh1 - h1
+        else:
+            game.make(action)
+            game.next_player()
+            value = -negamax(game, depth - 1, ilevel + 1)
+            game.previous_player()
+            game.unmake(action)
+
+        best = max(best, value)
+
+    return best
+
+
+def random_games(rows: int, cols: int, seed: int, games: int, plies: int):
+    """ Generates the positions of random games, of the given size
+    """
+    rand = random.Random(seed)
+    for _ in range(games):
+        game = Game(rows, cols)
+        for _ in range(rand.randrange(plies)):
+            actions = brute_actions(game)
+            moves = [action for action in actions if action < game.layout.size]
+            game.do_action(game.decode_action(rand.choice(moves if rand.random() < 0.5 else actions)))
+            if game.finished:
+                break
+
+            game.next_player()
+        else:
+            yield game
+
+
+def test_think_brute_force():
+    """ Alpha-beta search with its TT, move ordering and pruning gives
+    the negamax value, up to depth 1
+    """
+    core.init()
+    for game in random_games(5, 5, 2, 8, 12):
+        ai = AI(game.current_player)
+        for depth in range(2):
+            ai.tt.clear()
+            assert ai.think(depth)[1] == negamax(game, depth)
+
+
+@pytest.mark.parametrize('batched', [False, True])
+def test_leaves_brute_force(batched, monkeypatch):
+    """ Leaves evaluation, one by one or in batches (if NumPy is available)
+    """
+    if batched and not batch.AVAILABLE:
+        pytest.skip('NumPy not available')
+
+    monkeypatch.setattr(cfg, 'AI_BATCH_LEAVES', batched)
+    monkeypatch.setattr(cfg, 'AI_BATCH_MIN', 0)
+    monkeypatch.setattr(cfg, 'AI_BATCH_SIZE', 16)
+    core.init()
+    for game in random_games(9, 9, 9, 6, 20):
+        ai = AI(game.current_player)
+        assert sorted(ai.leaves()) == [brute_leaf(game, action) for action in sorted(brute_actions(game))]
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+import core
+from engine.bitboard import reachable
+from engine.game import Game
+
+
+def state(player: int, pawns, game: Game) -> str:
+    """ Game.state string with the given (row, col) pawns, no walls on board
+    """
+    n = game.layout.num_slots
+    return str(player) + ''.join('%i%i10' % coord for coord in pawns) + '0' * 2 * n
+
+
+def moves(game: Game) -> list:
+    return [sorted(pawn.move_squares) for pawn in game.pawns]
+
+
+def test_state_pawns_swap():
+    """ Restoring a state where each pawn goes to the square the other one leaves
+    """
+    core.init()
+    game = Game()
+    game.state = state(0, [(4, 3), (4, 4)], game)
+    game.state = state(1, [(4, 4), (4, 3)], game)
+
+    fresh = Game()
+    fresh.state = state(1, [(4, 4), (4, 3)], fresh)
+    assert game.occupied == fresh.occupied
+    assert moves(game) == moves(fresh)
+
+
+def flood_legal(game: Game, index: int) -> bool:
+    """ Brute force can_put_wall_index: puts the wall and floods the board
+    from every pawn
+    """
+    if not (game.free_walls >> index) & 1:
+        return False
+
+    game.put_wall(index >> 1, index & 1)
+    result = all(reachable(game.layout, game.blocked, pawn.bit, pawn.goal_mask) for pawn in game.pawns)
+    game.remove_wall(index >> 1, index & 1)
+    return result
+
+
+def test_can_put_wall_index():
+    """ Against put-and-flood, along random games with plenty of walls
+    """
+    core.init()
+    rand = random.Random(7)
+    for _ in range(10):
+        game = Game()
+        for _ in range(40):
+            walls = range(2 * game.layout.num_slots)
+            legal = [index for index in walls if flood_legal(game, index)]
+            assert legal == [index for index in walls if game.can_put_wall_index(index)]
+            if not legal:
+                break
+
+            index = rand.choice(legal)
+            game.put_wall(index >> 1, index & 1)